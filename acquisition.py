@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+import logging
+import time
+
+from supervisor import heartbeat
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+
+ACQUISITION_PERIOD = 0.001  # Seconds between two reads of the encoder inputs
+
+
+class AcquisitionBackend:
+    """ How the encoder inputs are read.
+
+    The daemon creates the encoders and buttons, then calls
+    setup(encoders, buttons) and runs each (name, target) of workers() as a
+    supervised loop. recover() is called after the bus registers were
+    rewritten. Buttons are read by the daemon's own loop unless
+    reads_buttons is set.
+
+    The work is split into units (encoders, chips or INT lines) shared
+    among a fixed pool of worker threads, whatever the number of devices.
+    Each unit belongs to one worker, so the workers share no state. Only
+    the first worker gets the real-time settings.
+    """
+    name = None
+    interrupts = False     # Whether the chips get their GPINTEN image
+    reads_buttons = False  # Whether the buttons are fed port snapshots by the workers
+
+    def __init__(self, config, mcp_map, realtime=None, pool_size: int = 1):
+        self.config = config
+        self.mcp_map = mcp_map
+        self.realtime = realtime
+        self.pool_size = max(1, pool_size)
+        self.encoders = []
+        self.buttons = []
+        self.units = []
+
+    def setup(self, encoders, buttons=()):
+        self.encoders = encoders
+        self.buttons = list(buttons)
+
+    def read(self, unit):
+        """Reads one unit, called by its worker every ACQUISITION_PERIOD."""
+        raise NotImplementedError
+
+    def workers(self):
+        shards = [self.units[i::self.pool_size] for i in range(self.pool_size)]
+        return [(f"acquisition {i}", self._worker(shard, self.realtime if i == 0 else None))
+                for i, shard in enumerate(shards) if shard]
+
+    def _worker(self, units, realtime):
+        read = self.read
+
+        def acquisition_thread():
+            while True:
+                heartbeat()
+                for unit in units:
+                    read(unit)
+                if realtime is not None:
+                    realtime.tick()
+                time.sleep(ACQUISITION_PERIOD)
+        return acquisition_thread
+
+    def recover(self):
+        pass
+
+
+class PinPollingBackend(AcquisitionBackend):
+    """ Reads the clk and dt pins of every encoder, two transactions per encoder and period """
+    name = "pin"
+
+    def setup(self, encoders, buttons=()):
+        super().setup(encoders, buttons)
+        self.units = list(encoders)
+
+    def read(self, encoder):
+        encoder.read_encoder_state_machine()
+
+
+class SnapshotPollingBackend(AcquisitionBackend):
+    """ Reads the GPIO port of each chip with encoders or buttons, only the controls whose bits changed are
+    decoded. Buttons get the snapshot timestamps for debouncing. """
+    name = "snapshot"
+    reads_buttons = True
+
+    def setup(self, encoders, buttons=()):
+        super().setup(encoders, buttons)
+        for enc, encoder in zip(self.config.encoders, encoders):
+            self.config.chip(enc["chip"]).bind((enc["clk"], enc["dt"]), encoder.update)
+        chip_of = {id(self.mcp_map[name]): chip for name, chip in self.config.chips.items()}
+        for button in self.buttons:
+            chip_of[id(button.mcp)].bind((button.pin_num,), button.update)
+        units = self._units([(chip, self.mcp_map[name]) for name, chip in self.config.chips.items()
+                             if chip.watch_mask])
+        # Each unit also settles the buttons of its chips
+        self.units = [(int_pin, chips, [button for button in self.buttons
+                                        if any(button.mcp is mcp for _, mcp in chips)])
+                      for int_pin, chips in units]
+        self.recover()
+
+    def _units(self, chips):
+        """[(INT pin or None, [(chip config, MCP23017)])]: each chip polled on its own."""
+        return [(None, [pair]) for pair in chips]
+
+    def recover(self):
+        for int_pin, chips, buttons in self.units:
+            for chip, mcp in chips:
+                chip.last_snapshot = mcp.gpio  # Also clears a pending interrupt
+
+    def read(self, unit):
+        int_pin, chips, buttons = unit
+        if int_pin is None or not int_pin.value:
+            for chip, mcp in chips:
+                snapshot = mcp.gpio
+                chip.dispatch(snapshot, time.monotonic_ns())
+        if buttons:
+            t_ns = time.monotonic_ns()
+            for button in buttons:
+                button.settle(t_ns)
+
+
+class InterruptBackend(SnapshotPollingBackend):
+    """ Like snapshot polling, but the ports are only read while their INT line is low.
+
+    An INT line may be shared by several chips (open-drain outputs): all of
+    them are read when it is low, which also clears it. The bus load scales
+    with the lines that fired, not with the number of chips.
+    """
+    name = "interrupt"
+    interrupts = True
+
+    def __init__(self, config, mcp_map, realtime=None, pool_size: int = 1, int_pins=None):
+        super().__init__(config, mcp_map, realtime, pool_size)
+        self.int_pins = int_pins  # INT pin name -> pin with a value, created from the config if None
+
+    def _units(self, chips):
+        if self.int_pins is None:
+            import board
+            import digitalio
+
+            self.int_pins = {}
+            for line in self.config.int_lines:
+                pin = digitalio.DigitalInOut(getattr(board, line))
+                pin.direction = digitalio.Direction.INPUT
+                pin.pull = digitalio.Pull.UP
+                self.int_pins[line] = pin
+        lines = {}
+        polled = []
+        for chip, mcp in chips:
+            if chip.int_pin:
+                lines.setdefault(chip.int_pin, []).append((chip, mcp))
+            else:
+                logger.warning(f"{chip.name} has no INT line: its port is polled")
+                polled.append((None, [(chip, mcp)]))
+        return [(self.int_pins[line], line_chips) for line, line_chips in lines.items()] + polled
+
+
+BACKENDS = {backend.name: backend for backend in (PinPollingBackend, SnapshotPollingBackend, InterruptBackend)}
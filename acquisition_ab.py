@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""A/B comparison of the encoder acquisition backends on simulated hardware.
+
+    python3 acquisition_ab.py                   # all backends, multieffect.toml
+    python3 acquisition_ab.py --backends pin interrupt --detents 50
+
+Each backend reads the same scripted encoder rotations from simulated
+MCP23017 chips. Every GPIO transaction takes the bus time i2c_budget.py
+computes for it, one at a time as on the real bus. Reports the CPU time of
+the acquisition threads, the bus transactions/s, the steps detected and the
+latency from input edge to queued step.
+"""
+import argparse
+import bisect
+import logging
+import threading
+import time
+
+from acquisition import BACKENDS
+from board_config import DEFAULT_CONFIG_PATH, load_board_config
+from i2c_budget import GPIO_READ, TRANSACTION_OVERHEAD_US, transaction_us
+from input_events import InputEventRing
+from rotary_encoder_int import RotaryEncoder
+from supervisor import Worker
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+
+EDGE_INTERVAL = 0.002  # Seconds between two quadrature edges of the script (125 detents/s)
+DETENTS = 25           # Detents per direction and encoder
+SETTLE = 0.05          # Seconds before and after the script
+
+CW = ((0, 1), (0, 0), (1, 0), (1, 1))   # (clk, dt) from rest (1, 1)
+CCW = ((1, 0), (0, 0), (0, 1), (1, 1))
+
+
+class SimulatedBus:
+    """ Serialises the simulated transactions and counts them """
+    def __init__(self, clock: int, overhead_us: float):
+        self.duration = transaction_us(GPIO_READ, clock, overhead_us) / 1e6
+        self.lock = threading.Lock()
+        self.transactions = 0
+
+    def read(self):
+        with self.lock:
+            self.transactions += 1
+            time.sleep(self.duration)
+
+
+class SimulatedPin:
+    """ MCP23017 pin: reading its value is one GPIO transaction """
+    def __init__(self, mcp, pin: int):
+        self.mcp = mcp
+        self.pin = pin
+        self.direction = None
+        self.pull = None
+
+    @property
+    def value(self):
+        return bool((self.mcp.gpio >> self.pin) & 1)
+
+
+class SimulatedMCP23017:
+    """ Port state set by the script, INT asserted on watched changes until GPIO is read """
+    def __init__(self, bus: SimulatedBus, interrupts: int = 0):
+        self.bus = bus
+        self.interrupts = interrupts  # GPINTEN image, 0 without interrupt acquisition
+        self.state = 0xFFFF           # Pulled up
+        self.pending = False
+
+    def get_pin(self, pin: int):
+        return SimulatedPin(self, pin)
+
+    @property
+    def gpio(self):
+        self.bus.read()
+        self.pending = False
+        return self.state
+
+    def set_bits(self, bits):
+        """bits: {pin: level}, applied at once."""
+        state = self.state
+        for pin, level in bits.items():
+            state = state | (1 << pin) if level else state & ~(1 << pin)
+        if (state ^ self.state) & self.interrupts:
+            self.pending = True
+        self.state = state
+
+
+class SimulatedIntLine:
+    """ Active-low INT line shared by simulated chips, read without a bus transaction """
+    def __init__(self, chips):
+        self.chips = chips
+
+    @property
+    def value(self):
+        return not any(mcp.pending for mcp in self.chips)
+
+
+def rotate(chips, encoders, detents: int, edge_interval: float, edges):
+    """Turns each encoder detents times clockwise then back, appending the edge times (ns)."""
+    for mcp, enc in zip(chips, encoders):
+        for sequence in (CW, CCW):
+            for _ in range(detents):
+                for clk, dt in sequence:
+                    mcp.set_bits({enc["clk"]: clk, enc["dt"]: dt})
+                    edges.append(time.monotonic_ns())
+                    time.sleep(edge_interval)
+
+
+def run(backend_name: str, config_path: str, clock: int, overhead_us: float, detents: int, edge_interval: float,
+        pool_size: int = 1):
+    """Runs one backend on the script, returns its result row."""
+    config = load_board_config(config_path)
+    bus = SimulatedBus(clock, overhead_us)
+    backend_class = BACKENDS[backend_name]
+    mcp_map = {name: SimulatedMCP23017(bus, chip.gpinten if backend_class.interrupts else 0)
+               for name, chip in config.chips.items()}
+    int_pins = {line: SimulatedIntLine([mcp_map[chip.name] for chip in chips])
+                for line, chips in config.int_lines.items()}
+    if backend_class.interrupts:
+        backend = backend_class(config, mcp_map, pool_size=pool_size, int_pins=int_pins)
+    else:
+        backend = backend_class(config, mcp_map, pool_size=pool_size)
+
+    n_steps = len(config.encoders) * detents * 2  # One step per detent, on every backend
+    events = InputEventRing(max(256, 2 * n_steps))
+    encoders = [RotaryEncoder(None, mcp_map[enc["chip"]], enc["name"], enc["clk"], enc["dt"], enc["sw"], enc["cc"],
+                              events, configure=False, initial_value=0)
+                for enc in config.encoders]
+    backend.setup(encoders)
+
+    cpu = {}
+
+    def measured(name, target):
+        def loop():
+            start = time.thread_time()
+            try:
+                target()
+            finally:
+                cpu[name] = cpu.get(name, 0.0) + time.thread_time() - start
+        return loop
+
+    workers = [Worker(name, measured(name, target)) for name, target in backend.workers()]
+    bus.transactions = 0
+    started = time.monotonic()
+    for worker in workers:
+        worker.start()
+    time.sleep(SETTLE)
+    edges = []
+    rotate([mcp_map[enc["chip"]] for enc in config.encoders], config.encoders, detents, edge_interval, edges)
+    time.sleep(SETTLE)
+    for worker in workers:
+        worker.generation += 1  # The next heartbeat() raises WorkerRetired
+    for worker in workers:
+        worker.thread.join()
+    elapsed = time.monotonic() - started
+
+    latencies = []
+
+    def collect(event):
+        i = bisect.bisect_right(edges, event.t_ns) - 1
+        if i >= 0:
+            latencies.append((event.t_ns - edges[i]) / 1e3)
+
+    events.drain(collect)
+    latencies.sort()
+    return {
+        "backend": backend_name,
+        "threads": len(workers),
+        "cpu %": sum(cpu.values()) / elapsed * 100,
+        "trans/s": bus.transactions / elapsed,
+        "steps": len(latencies),
+        "expected": n_steps,
+        "mean µs": sum(latencies) / len(latencies) if latencies else float("nan"),
+        "p99 µs": latencies[int(len(latencies) * 0.99)] if latencies else float("nan"),
+        "max µs": latencies[-1] if latencies else float("nan"),
+    }
+
+
+def report(rows) -> str:
+    columns = ("backend", "threads", "cpu %", "trans/s", "steps", "expected", "mean µs", "p99 µs", "max µs")
+    lines = ["  ".join(f"{column:>9}" for column in columns)]
+    for row in rows:
+        lines.append("  ".join(f"{row[column]:>9}" if isinstance(row[column], (str, int))
+                               else f"{row[column]:9.1f}" for column in columns))
+    return "\n".join(lines)
+
+
+# === Main ===
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description="A/B comparison of the encoder acquisition backends")
+    parser.add_argument("config", nargs="?", default=DEFAULT_CONFIG_PATH, help="board configuration file")
+    parser.add_argument("--backends", nargs="+", choices=sorted(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--clock", type=int, default=None, help="bus clock in Hz (default: [i2c] clock)")
+    parser.add_argument("--overhead", type=float, default=TRANSACTION_OVERHEAD_US,
+                        help="software overhead per transaction, µs")
+    parser.add_argument("--detents", type=int, default=DETENTS, help="detents per direction and encoder")
+    parser.add_argument("--workers", type=int, default=None, help="acquisition workers (default: [acquisition] workers)")
+    parser.add_argument("--edge-ms", type=float, default=EDGE_INTERVAL * 1000, help="ms between quadrature edges")
+    args = parser.parse_args()
+
+    config = load_board_config(args.config)
+    clock = args.clock or config.i2c_clock
+    workers = args.workers or config.acquisition_workers
+    rows = [run(name, args.config, clock, args.overhead, args.detents, args.edge_ms / 1000, workers)
+            for name in args.backends]
+    print(report(rows))
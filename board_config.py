@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+import logging
+import os
+import tomllib
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "multieffect.toml")
+
+IOCON_MIRROR = 0x40  # INTA/INTB internally connected
+IOCON_ODR = 0x04     # INT pins open-drain (Adafruit driver default)
+
+# MCP23017 registers (IOCON.BANK = 0: A and B registers interleaved)
+IODIRA = 0x00  # IODIR, IPOL, GPINTEN, DEFVAL, INTCON, IOCON, GPPU follow, A then B
+OLATA = 0x14
+CONFIG_BLOCK_SIZE = 14  # IODIRA..GPPUB
+
+MCP_ADDRESSES = range(0x20, 0x28)  # A2..A0 strapping: up to 8 MCP23017 on one bus
+ADS_ADDRESSES = range(0x48, 0x4C)  # ADDR to GND, VDD, SDA or SCL: up to 4 ADS1115
+DEFAULT_ADCS = [{"name": "ads", "address": 0x48}]
+
+
+class ChipConfig:
+    """ Compiled MCP23017 configuration: register images and bit dispatch table """
+    def __init__(self, name: str, address: int, int_pin: str = None):
+        self.name = name
+        self.address = address
+        self.int_pin = int_pin
+        self.inputs = 0       # Bit set for each pin used as input
+        self.outputs = 0      # Bit set for each pin used as output
+        self.pullups = 0      # GPPU image
+        self.interrupts = 0   # GPINTEN image
+        self.initial = 0      # OLAT image: outputs set high at startup
+        self.owners = {}      # pin -> description, to detect conflicts
+        # Dispatch table: pin -> indices into self.handlers
+        self.bit_handlers = [() for _ in range(16)]
+        self.handlers = []
+        self.watch_mask = 0
+        self.last_snapshot = 0
+
+    @property
+    def iodir(self):
+        """IODIR image: 1 = input. Unused pins stay inputs, as after reset."""
+        return 0xFFFF & ~self.outputs
+
+    @property
+    def gppu(self):
+        return self.pullups
+
+    @property
+    def gpinten(self):
+        return self.interrupts
+
+    @property
+    def iocon(self):
+        return IOCON_MIRROR | IOCON_ODR
+
+    @property
+    def ipol(self):
+        return 0x0000  # Controls handle active-low inputs themselves
+
+    @property
+    def defval(self):
+        return 0x0000  # Unused: INTCON compares with the previous value
+
+    @property
+    def intcon(self):
+        return 0x0000  # Interrupt on any change
+
+    @property
+    def olat(self):
+        return self.initial
+
+    def config_block(self, interrupts: bool = True) -> bytes:
+        """IODIRA..GPPUB register values, to be written in one sequential transaction."""
+        block = bytearray()
+        for value in (self.iodir, self.ipol, self.gpinten if interrupts else 0, self.defval, self.intcon):
+            block += value.to_bytes(2, "little")
+        block += bytes((self.iocon, self.iocon))  # IOCON is mapped at both addresses
+        block += self.gppu.to_bytes(2, "little")
+        return bytes(block)
+
+    def write_registers(self, mcp, interrupts: bool = True, verify: bool = False):
+        """Writes the whole register image to the chip: OLAT first, then IODIRA..GPPUB.
+
+        Two I2C transactions instead of a read-modify-write per pin and per
+        register. With verify, reads the registers back and raises OSError on
+        any difference.
+        """
+        block = self.config_block(interrupts)
+        with mcp._device as device:
+            device.write(bytes((OLATA,)) + self.olat.to_bytes(2, "little"))
+            device.write(bytes((IODIRA,)) + block)
+        if verify:
+            readback = bytearray(CONFIG_BLOCK_SIZE)
+            olat = bytearray(2)
+            with mcp._device as device:
+                device.write_then_readinto(bytes((IODIRA,)), readback)
+                device.write_then_readinto(bytes((OLATA,)), olat)
+            if readback != block or int.from_bytes(olat, "little") != self.olat:
+                raise OSError(f"{self.name}: register verification failed, wrote {block.hex()} "
+                              f"OLAT {self.olat:04X}, read {readback.hex()} OLAT {olat.hex()}")
+
+    def claim(self, pin: int, owner: str, output: bool = False, pullup: bool = True, interrupt: bool = False,
+              initial: bool = False):
+        if not 0 <= pin <= 15:
+            raise ValueError(f"{self.name}: pin {pin} of {owner} out of range 0..15")
+        if pin in self.owners:
+            raise ValueError(f"{self.name}: pin {pin} used by both {self.owners[pin]} and {owner}")
+        self.owners[pin] = owner
+        bit = 1 << pin
+        if output:
+            self.outputs |= bit
+            if initial:
+                self.initial |= bit
+        else:
+            self.inputs |= bit
+            if pullup:
+                self.pullups |= bit
+            if interrupt:
+                self.interrupts |= bit
+
+    def bind(self, pins, handler):
+        """Register handler(snapshot, t_ns), called once per snapshot where any of pins changed."""
+        idx = len(self.handlers)
+        self.handlers.append(handler)
+        for pin in pins:
+            self.bit_handlers[pin] = self.bit_handlers[pin] + (idx,)
+            self.watch_mask |= 1 << pin
+
+    def dispatch(self, snapshot: int, t_ns: int = 0):
+        """Visits only the handlers bound to bits that changed since the last snapshot, read at t_ns."""
+        changed = (snapshot ^ self.last_snapshot) & self.watch_mask
+        self.last_snapshot = snapshot
+        visited = 0
+        while changed:
+            low = changed & -changed  # Lowest set bit
+            changed ^= low
+            for idx in self.bit_handlers[low.bit_length() - 1]:
+                if not visited >> idx & 1:
+                    visited |= 1 << idx
+                    self.handlers[idx](snapshot, t_ns)
+
+    def __repr__(self):
+        return (f"ChipConfig({self.name}@0x{self.address:02X}, IODIR=0x{self.iodir:04X}, "
+                f"GPPU=0x{self.gppu:04X}, GPINTEN=0x{self.gpinten:04X}, OLAT=0x{self.olat:04X})")
+
+
+class BoardConfig:
+    """ Board description loaded from multieffect.toml """
+    def __init__(self, data: dict):
+        self.switch_cc = data.get("midi", {}).get("switch_cc", 64)
+        self.echo_window_ms = data.get("midi", {}).get("echo_window_ms", 50)
+        self.midi_batch_window_ms = data.get("midi", {}).get("batch_window_ms", 2)
+        self.midi_max_hold_ms = data.get("midi", {}).get("max_hold_ms", 20)
+        self.acquisition = data.get("acquisition", {}).get("backend", "pin")
+        self.acquisition_workers = data.get("acquisition", {}).get("workers", 4)
+        self.debounce_ms = data.get("debounce", {}).get("lockout_ms", 30)
+        self.gestures = data.get("gestures", {})
+        self.led_frame_rate = data.get("leds", {}).get("frame_rate", 30)
+        self.verify_registers = data.get("i2c", {}).get("verify_registers", False)
+        self.profile_i2c = data.get("i2c", {}).get("profile", False)
+        self.i2c_clock = data.get("i2c", {}).get("clock", 400000)
+        self.state_path = os.path.expanduser(data.get("state", {}).get("path", "~/.local/state/kleagmfx/state.json"))
+        self.state_interval = data.get("state", {}).get("interval", 2.0)
+        self.metrics = data.get("metrics", {})
+
+        self.chips = {}
+        for chip in data["chips"]:
+            self.chips[chip["name"]] = ChipConfig(chip["name"], chip["address"], chip.get("int_pin"))
+        self._check_addresses("MCP23017", {name: chip.address for name, chip in self.chips.items()}, MCP_ADDRESSES)
+
+        # ADS1115 converters, by name
+        self.adcs = {adc["name"]: adc["address"] for adc in data.get("adcs", DEFAULT_ADCS)}
+        self._check_addresses("ADS1115", self.adcs, ADS_ADDRESSES)
+
+        self.power_led = data.get("power_led")
+        if self.power_led:
+            self.chip(self.power_led["chip"]).claim(self.power_led["pin"], "power_led", output=True, initial=True)
+
+        self.footswitches = data.get("footswitches", [])
+        for i, fs in enumerate(self.footswitches):
+            chip = self.chip(fs["chip"])
+            chip.claim(fs["pin"], f"footswitch {i}", interrupt=fs.get("interrupt", True))
+            if fs.get("led") is not None:
+                chip.claim(fs["led"], f"footswitch {i} led", output=True)
+
+        self.encoders = data.get("encoders", [])
+        for enc in self.encoders:
+            chip = self.chip(enc["chip"])
+            for role in ("clk", "dt", "sw"):
+                chip.claim(enc[role], f"{enc['name']} {role}", interrupt=enc.get("interrupt", True))
+
+        self.keypad = data.get("keypad")
+        if self.keypad:
+            chip = self.chip(self.keypad["chip"])
+            for pin in self.keypad["rows"]:
+                chip.claim(pin, "keypad row", output=True, initial=True)  # Rows idle high
+            for pin in self.keypad["cols"]:
+                chip.claim(pin, "keypad col")
+
+        self.joystick = data.get("joystick")
+        if self.joystick:
+            self.chip(self.joystick["chip"]).claim(self.joystick["sw"], "joystick sw")
+            self.joystick.setdefault("adc", next(iter(self.adcs)))
+            self.adc(self.joystick["adc"])
+
+        self.pedal = data.get("pedal")
+        if self.pedal:
+            self.pedal.setdefault("adc", next(iter(self.adcs)))
+            self.adc(self.pedal["adc"])
+        self.pipewire_links = [(link["output"], link["input"]) for link in data.get("pipewire_links", [])]
+
+    def chip(self, name: str) -> ChipConfig:
+        try:
+            return self.chips[name]
+        except KeyError:
+            raise ValueError(f"Unknown chip {name!r}, expected one of {list(self.chips)}") from None
+
+    def debounce(self, control: dict) -> float:
+        """Debounce lockout of a foot switch or encoder push button, seconds."""
+        return control.get("debounce_ms", self.debounce_ms) / 1000
+
+    def adc(self, name: str) -> int:
+        try:
+            return self.adcs[name]
+        except KeyError:
+            raise ValueError(f"Unknown ADC {name!r}, expected one of {list(self.adcs)}") from None
+
+    @staticmethod
+    def _check_addresses(kind: str, addresses: dict, valid: range):
+        if len(addresses) > len(valid):
+            raise ValueError(f"{len(addresses)} {kind} configured, at most {len(valid)} on one bus")
+        seen = {}
+        for name, address in addresses.items():
+            if address not in valid:
+                raise ValueError(f"{kind} {name}: address 0x{address:02X} out of range "
+                                 f"0x{valid.start:02X}..0x{valid.stop - 1:02X}")
+            if address in seen:
+                raise ValueError(f"{kind} {seen[address]} and {name} both at address 0x{address:02X}")
+            seen[address] = name
+
+    def hardware(self) -> dict:
+        """By section, what only a restart can change: pin roles (in the register images), converters, services."""
+        return {
+            "chips": [(chip.name, chip.address, chip.int_pin, chip.iodir, chip.gppu, chip.gpinten, chip.olat)
+                      for chip in self.chips.values()],
+            "adcs": self.adcs,
+            "acquisition": (self.acquisition, self.acquisition_workers),
+            "power_led": self.power_led and (self.power_led["chip"], self.power_led["pin"]),
+            "footswitches": [(fs["chip"], fs["pin"], fs.get("led")) for fs in self.footswitches],
+            "encoders": [(enc["chip"], enc["clk"], enc["dt"], enc["sw"]) for enc in self.encoders],
+            "keypad": self.keypad and (self.keypad["chip"], self.keypad["rows"], self.keypad["cols"]),
+            "joystick": self.joystick and (self.joystick["chip"], self.joystick["sw"], self.joystick["adc"],
+                                           self.joystick["x_channel"], self.joystick["y_channel"]),
+            "pedal": self.pedal and (self.pedal["adc"], self.pedal["channel"]),
+            "leds": self.led_frame_rate,
+            "i2c": (self.verify_registers, self.profile_i2c, self.i2c_clock),
+            "state": (self.state_path, self.state_interval),
+            "metrics": self.metrics,
+            "pipewire_links": self.pipewire_links,
+        }
+
+    def hardware_changes(self, other: "BoardConfig") -> list:
+        """Sections of hardware() that differ in other: a reload cannot apply it."""
+        mine, theirs = self.hardware(), other.hardware()
+        return [section for section in mine if mine[section] != theirs[section]]
+
+    @property
+    def int_lines(self):
+        """{INT pin: [ChipConfig]}: chips whose INT outputs are wired to each Pi pin, one or several (open-drain)."""
+        lines = {}
+        for chip in self.chips.values():
+            if chip.int_pin:
+                lines.setdefault(chip.int_pin, []).append(chip)
+        return lines
+
+    @property
+    def encoder_ccs(self):
+        return [enc["cc"] for enc in self.encoders]
+
+
+def load_board_config(path: str = DEFAULT_CONFIG_PATH) -> BoardConfig:
+    with open(path, "rb") as f:
+        config = BoardConfig(tomllib.load(f))
+    for chip in config.chips.values():
+        logger.info(f"{chip}")
+    return config
+
+
+# === Main ===
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    load_board_config(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_CONFIG_PATH)
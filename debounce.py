@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+import logging
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+
+DEBOUNCE_LOCKOUT = 0.03  # Seconds during which a switch ignores its input after an edge
+
+
+class Debouncer:
+    """ Lockout debouncing of one switch, on timestamped samples.
+
+    The first edge is reported at once, then the input is ignored for the
+    lockout window: bounces cannot toggle twice and the response time is
+    the acquisition latency only. A level that changed during the lockout
+    and stayed is reported by settle() once the lockout ends, without a
+    new read: with interrupt acquisition, no read happens until the next
+    change.
+    """
+    __slots__ = ("lockout_ns", "state", "raw", "until_ns", "bounces")
+
+    def __init__(self, lockout: float = DEBOUNCE_LOCKOUT, state: bool = False):
+        self.lockout_ns = int(lockout * 1e9)
+        self.state = state  # Debounced level
+        self.raw = state    # Last sampled level
+        self.until_ns = 0   # End of the current lockout
+        self.bounces = 0    # Level changes ignored during lockouts
+
+    def sample(self, level: bool, t_ns: int) -> bool:
+        """Feeds the level read at t_ns. True if the debounced state changed."""
+        if t_ns < self.until_ns:
+            if level != self.raw:
+                self.bounces += 1
+            self.raw = level
+            return False
+        self.raw = level
+        if level == self.state:
+            return False
+        self.state = level
+        self.until_ns = t_ns + self.lockout_ns
+        return True
+
+    def settle(self, t_ns: int) -> bool:
+        """After the lockout, takes the last sampled level if it differs. True if the state changed."""
+        if self.raw != self.state and t_ns >= self.until_ns:
+            return self.sample(self.raw, t_ns)
+        return False
+
+
+# === Main ===
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    # A press bouncing for 5 ms, held 100 ms, then a release bouncing for 3 ms, sampled every ms
+    debouncer = Debouncer()
+    levels = [False] * 5 + [True, False, True, False, True] + [True] * 100 + [False, True, False] + [False] * 50
+    for ms, level in enumerate(levels):
+        t_ns = ms * 1_000_000
+        if debouncer.sample(level, t_ns) or debouncer.settle(t_ns):
+            logger.info(f"{ms} ms: {'pressed' if debouncer.state else 'released'}")
+    logger.info(f"{debouncer.bounces} bounces ignored")
@@ -1,9 +1,7 @@
 #!/usr/bin/env python3
 import adafruit_ads1x15.ads1115 as ADS
-import board
-import busio
 import logging
-import mido
+import math
 import statistics
 import threading
 import time
@@ -11,37 +9,129 @@ import time
 from adafruit_ads1x15.analog_in import AnalogIn
 from signal import pause
 
+from fast_midi import FastMidiOut
+from metrics import inc
+from supervisor import heartbeat
+
 # The actual voltages measured at the physical limits of the pedal
 V_MIN = 0.006
 V_MAX = 2.768
 MIDI_CC_NUMBER = 24
+HYSTERESIS = 4      # Position change (0..127) needed to compute a new frame
+MAX_GROUP_RATE = 50  # CC groups per second at most, later changes are merged into the next group
 
 logger = logging.getLogger(__name__)
 
+# Taper curves: position 0..1 -> 0..1
+TAPERS = {
+    "linear": lambda x: x,
+    "log": lambda x: math.log10(1 + 9 * x),  # Fast rise, like an audio taper pot reversed
+    "exp": lambda x: (10 ** x - 1) / 9,      # Slow start, fine control at the heel
+}
+
+
+def taper_lut(taper="linear", low: int = 0, high: int = 127):
+    """CC value for each pedal position 0..127. taper: a TAPERS name or [[position, value], ...] points.
+
+    low > high inverts the range. With points, values are taken as is and low/high are ignored.
+    """
+    if isinstance(taper, str):
+        try:
+            curve = TAPERS[taper]
+        except KeyError:
+            raise ValueError(f"Unknown taper {taper!r}, expected one of {list(TAPERS)} or points") from None
+        return tuple(max(0, min(127, round(low + (high - low) * curve(position / 127)))) for position in range(128))
+    points = sorted((int(position), int(value)) for position, value in taper)
+    if not points:
+        raise ValueError("Taper points must not be empty")
+    lut = []
+    for position in range(128):
+        if position <= points[0][0]:
+            lut.append(points[0][1])
+        elif position >= points[-1][0]:
+            lut.append(points[-1][1])
+        else:
+            for (p0, v0), (p1, v1) in zip(points, points[1:]):
+                if p0 <= position <= p1:
+                    lut.append(round(v0 + (v1 - v0) * (position - p0) / (p1 - p0)))
+                    break
+    return tuple(max(0, min(127, value)) for value in lut)
+
+
+class PedalTarget:
+    """ One CC driven by the pedal, through a precomputed LUT """
+    __slots__ = ("cc", "lut", "sent")
+
+    def __init__(self, cc: int, lut=None):
+        self.cc = cc
+        self.lut = lut if lut is not None else taper_lut()
+        self.sent = -1  # Last value sent
+
+    def __repr__(self):
+        return f"PedalTarget(cc {self.cc}, {self.lut[0]}..{self.lut[127]})"
+
+
+def morph_targets(a: dict, b: dict, taper="linear"):
+    """Targets moving each CC of two snapshots {cc: value} from its a value (heel) to its b value (toe)."""
+    targets = []
+    for cc in sorted(set(a) | set(b)):
+        low = a.get(cc, b.get(cc))
+        high = b.get(cc, low)
+        targets.append(PedalTarget(int(cc), taper_lut(taper, low, high)))
+    return targets
+
+
+def targets_from_config(pedal: dict):
+    """Targets of the [pedal] config: morph between two snapshots if set, else the targets list."""
+    morph = pedal.get("morph")
+    if morph:
+        return morph_targets({int(cc): v for cc, v in morph["a"].items()},
+                             {int(cc): v for cc, v in morph["b"].items()}, morph.get("taper", "linear"))
+    return [PedalTarget(target["cc"], taper_lut(target.get("taper", "linear"), target.get("min", 0),
+                                                target.get("max", 127)))
+            for target in pedal.get("targets", [{"cc": MIDI_CC_NUMBER}])]
+
 class ExpressionPedal:
-    def __init__(self, midi_out, ads: ADS.ADS1115, lock: threading.Lock, channel=ADS.P2, gain=1, v_ref=3.3):
+    """ Expression pedal driving one or more CCs.
+
+    Each frame, the smoothed position goes through the LUT of every target
+    and the values that changed are sent together with one send_ccs, at
+    most max_rate times per second: a fast sweep over many targets sends
+    one group per frame instead of a message per step and target.
+    """
+    def __init__(self, midi_out, ads: ADS.ADS1115, lock: threading.Lock, channel=ADS.P2, gain=1, v_ref=3.3,
+                 targets=None, max_rate: float = MAX_GROUP_RATE):
         self.midi_out = midi_out
         # --- HARDWARE INITIALIZATION ---
         self.ads = ads
         self.lock = lock
         self.chan = AnalogIn(self.ads, channel)
+        self._metric_labels = (("channel", channel),)
         self.ads.data_rate = 860
 
         # 2. Configuration
         self.v_ref = v_ref
         self.ads.gain = gain  # Gain 1 = +/- 4.096V
 
-        self._current_midi_val = -1
+        self._current_midi_val = -1  # Position of the last frame
         self._running = False
         self.window_size = 5
         self.readings = [0] * self.window_size
+        self.targets = targets if targets is not None else [PedalTarget(MIDI_CC_NUMBER)]
+        self.min_interval = 1 / max_rate
+        self._pending = {}  # cc -> value, not sent yet because of the rate limit
+        self._next_send = 0.0
+        self._retarget = False
+        self.on_position = None  # Called with each new position (0..127, before the targets' LUTs)
 
 
     def poll(self):
         self._running = True
         while self._running:
+            heartbeat()
             with self.lock:
                 voltage = self.chan.voltage
+            inc("ads_conversions_total", self._metric_labels)
 
             # Map voltage to 0-127 (MIDI Range)
             raw_percent = ((voltage - V_MIN) * 127) / (V_MAX - V_MIN)
@@ -53,27 +143,70 @@ class ExpressionPedal:
             smoothed_val = int(statistics.median(self.readings))
             logger.debug(f"Pedal: {voltage};\t{clamped};\t{smoothed_val}")
 
-            # Only send MIDI message if the value has actually changed
-            if abs(smoothed_val - self._current_midi_val) >= 4:
+            # Only compute a frame if the position has actually changed
+            if abs(smoothed_val - self._current_midi_val) >= HYSTERESIS or self._retarget:
+                self._retarget = False
                 self._current_midi_val = smoothed_val
-                self.send_midi(smoothed_val)
+                self.stage(smoothed_val)
+                if self.on_position is not None:
+                    self.on_position(smoothed_val)
+            self.flush()
 
             time.sleep(0.01)
 
-    def send_midi(self, value):
-        msg = mido.Message('control_change', control=MIDI_CC_NUMBER, value=value)
-        self.midi_out.send(msg)
-        logger.debug(f"Pedal: Sent MIDI CC {MIDI_CC_NUMBER}: {value}")
+    def set_targets(self, targets):
+        """Replaces the targets, e.g. morph_targets() of two snapshots. Applied at the next frame."""
+        self.targets = targets
+        self._retarget = True
+
+    def stage(self, position: int):
+        for target in self.targets:
+            value = target.lut[position]
+            if value != target.sent:
+                self._pending[target.cc] = value
+
+    def flush(self):
+        """Sends the pending values as one group, unless the previous group was less than min_interval ago."""
+        if not self._pending:
+            return
+        now = time.monotonic()
+        if now < self._next_send:
+            return
+        self._next_send = now + self.min_interval
+        group = self._pending
+        self._pending = {}
+        for target in self.targets:
+            value = group.get(target.cc)
+            if value is not None:
+                target.sent = value
+        self.midi_out.send_ccs(list(group.items()))
+        inc("pedal_groups_total")
+        logger.debug(f"Pedal: Sent {group}")
+
+    @property
+    def position(self):
+        """Position of the last frame, None before the first one."""
+        return self._current_midi_val if self._current_midi_val >= 0 else None
+
+    def restore(self, value):
+        """Sets the last position without sending anything."""
+        self._current_midi_val = value
+        self.readings = [value] * self.window_size  # Else the first median would be 0: a jump to the heel
+        for target in self.targets:
+            target.sent = target.lut[value]
 
 
 if __name__ == "__main__":
+    import board
+    import busio
+
     logging.basicConfig(level=logging.DEBUG)
     i2c = busio.I2C(board.SCL, board.SDA)
     i2c_lock = threading.Lock()
     ads = ADS.ADS1115(i2c)
     # --- MIDI SETUP ---
     # This creates a virtual MIDI port that shows up in patchage/qjackctl
-    midi_out = mido.open_output('ExpressionPedalPort', virtual=True)
+    midi_out = FastMidiOut('ExpressionPedalPort')
     logger.info("Virtual MIDI port 'ExpressionPedalPort' created.")
 
     pedal = ExpressionPedal(midi_out, ads, i2c_lock)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+import logging
+import threading
+import time
+
+from input_events import InputEventRing, MIDI_CC, MIDI_PROGRAM
+from metrics import inc
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+
+PORT_NAME = 'KleagMFX'
+
+CONTROL_CHANGE = 0xB0
+PROGRAM_CHANGE = 0xC0
+
+BATCH_WINDOW = 0.002  # Messages arriving within this delay of the previous one are applied together
+MAX_HOLD = 0.02       # Seconds a burst is held at most before it is applied
+
+# Metric labels, built once: counting a message does not allocate either
+OUT_CC_LABELS = tuple((("direction", "out"), ("cc", cc)) for cc in range(128))
+OUT_PROGRAM_LABELS = (("direction", "out"), ("cc", "program"))
+IN_CC_LABELS = tuple((("direction", "in"), ("cc", cc)) for cc in range(128))
+IN_PROGRAM_LABELS = (("direction", "in"), ("cc", "program"))
+
+
+class FastMidiOut:
+    """ Virtual MIDI output sending prebuilt raw messages straight to python-rtmidi.
+
+    The port is opened like mido.open_output(name, virtual=True) does with its
+    rtmidi backend: a 'RtMidiOut Client' client with a virtual port called
+    name, so the PipeWire port names do not change. For each (channel, CC)
+    used, the 128 possible 3-byte messages are built once, so sending a CC is
+    a table lookup and does not allocate.
+    """
+    def __init__(self, name: str = PORT_NAME, midi_out=None):
+        if midi_out is None:
+            import rtmidi
+            midi_out = rtmidi.MidiOut()
+            midi_out.open_virtual_port(name)
+        self.name = name
+        self._rt = midi_out
+        self._send = midi_out.send_message
+        self._lock = threading.Lock()  # mido ports serialise sends too
+        self._cc_tables = {}
+        self._pc_tables = {}
+
+    def cc_table(self, cc: int, channel: int = 0):
+        """Returns the prebuilt messages for a CC, one per value."""
+        key = (channel << 7) | cc
+        table = self._cc_tables.get(key)
+        if table is None:
+            status = CONTROL_CHANGE | channel
+            table = self._cc_tables[key] = tuple(bytes((status, cc, value)) for value in range(128))
+        return table
+
+    def send_cc(self, cc: int, value: int, channel: int = 0):
+        table = self._cc_tables.get((channel << 7) | cc) or self.cc_table(cc, channel)
+        with self._lock:
+            self._send(table[value])
+        inc("midi_messages_total", OUT_CC_LABELS[cc])
+
+    def send_ccs(self, group, channel: int = 0):
+        """Sends [(cc, value)] back to back, under one lock acquisition."""
+        tables = self._cc_tables
+        messages = [(tables.get((channel << 7) | cc) or self.cc_table(cc, channel))[value] for cc, value in group]
+        with self._lock:
+            for message in messages:
+                self._send(message)
+        for cc, _ in group:
+            inc("midi_messages_total", OUT_CC_LABELS[cc])
+
+    def send_program_change(self, program: int, channel: int = 0):
+        table = self._pc_tables.get(channel)
+        if table is None:
+            table = self._pc_tables[channel] = tuple(bytes((PROGRAM_CHANGE | channel, p)) for p in range(128))
+        with self._lock:
+            self._send(table[program])
+        inc("midi_messages_total", OUT_PROGRAM_LABELS)
+
+    def send(self, msg):
+        """Compatibility with mido ports, for messages built elsewhere."""
+        with self._lock:
+            self._send(msg.bytes())
+
+    def close(self):
+        self._rt.close_port()
+
+
+class FastMidiIn:
+    """ Virtual MIDI input decoding raw messages in the python-rtmidi callback.
+
+    Opened like mido.open_input(name, virtual=True): a 'RtMidiIn Client'
+    client with a virtual port called name. The callback only decodes the
+    status and data bytes into a preallocated InputEventRing. dispatch_thread
+    hands them to handler(event) in batches: after the first message, it
+    waits until no message arrived for batch_window (a burst, like Guitarix
+    answering a program change, is over) or max_hold elapsed, applies all
+    pending events, then calls flush() once.
+    """
+    def __init__(self, handler, flush=None, name: str = PORT_NAME, batch_window: float = BATCH_WINDOW,
+                 max_hold: float = MAX_HOLD, midi_in=None):
+        self.handler = handler
+        self.flush = flush
+        self.batch_window = batch_window
+        self.max_hold = max(max_hold, batch_window)
+        self.events = InputEventRing()
+        self.batches = 0
+        self.largest_batch = 0
+        if midi_in is None:
+            import rtmidi
+            midi_in = rtmidi.MidiIn()
+            midi_in.open_virtual_port(name)
+        self.name = name
+        self._rt = midi_in
+        self._rt.set_callback(self._on_message)
+
+    def _on_message(self, event, data=None):
+        message, _delta = event
+        status = message[0] & 0xF0
+        if status == CONTROL_CHANGE and len(message) == 3:
+            self.events.push(message[1], MIDI_CC, message[2])
+            inc("midi_messages_total", IN_CC_LABELS[message[1]])
+        elif status == PROGRAM_CHANGE and len(message) == 2:
+            self.events.push(None, MIDI_PROGRAM, message[1])
+            inc("midi_messages_total", IN_PROGRAM_LABELS)
+
+    def collect(self):
+        """Waits for the end of the burst whose first message is pending."""
+        deadline = time.monotonic() + self.max_hold
+        pending = len(self.events)
+        while pending < self.events.size // 2:  # Never risk dropping messages
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(self.batch_window, remaining))
+            if len(self.events) == pending:
+                break  # Quiet for a whole window
+            pending = len(self.events)
+
+    def dispatch_thread(self):
+        while True:
+            self.events.wait()
+            self.collect()
+            count = self.events.drain(self.handler)
+            if count:
+                self.batches += 1
+                self.largest_batch = max(self.largest_batch, count)
+                if self.flush is not None:
+                    self.flush()
+
+    def close(self):
+        self._rt.cancel_callback()
+        self._rt.close_port()
+
+
+# === Main ===
+if __name__ == "__main__":
+    # Microbenchmark: mido.Message + port.send versus prebuilt raw messages.
+    # Both write to a sink that only counts, so only our side of the send is measured.
+    import gc
+
+    import mido
+
+    logging.basicConfig(level=logging.INFO)
+
+    class CountingSink:
+        def __init__(self):
+            self.count = 0
+
+        def send_message(self, message):
+            self.count += 1
+
+    N = 200_000
+    CC = 20
+
+    def run(label, send):
+        gc.collect()
+        collections_before = gc.get_stats()[0]["collections"]
+        start = time.perf_counter()
+        for i in range(N):
+            send(i & 0x7F)
+        elapsed = time.perf_counter() - start
+        collections = gc.get_stats()[0]["collections"] - collections_before
+        logger.info(f"{label:>10}: {elapsed / N * 1e6:6.2f} µs/message, {collections} gen0 collections for {N} messages")
+
+    # Current path: what mido's rtmidi port does in send()
+    sink = CountingSink()
+    def mido_send(value):
+        msg = mido.Message('control_change', control=CC, value=value)
+        sink.send_message(msg.bytes())
+    run("mido", mido_send)
+
+    fast = FastMidiOut(midi_out=CountingSink())
+    run("fast", lambda value: fast.send_cc(CC, value))
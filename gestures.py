@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+import logging
+import time
+
+from metrics import inc
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+
+DOUBLE_TAP_WINDOW = 0.3  # Seconds between two presses forming a double-tap
+LONG_PRESS_TIME = 0.6    # Seconds held for a long-press
+IDLE_TIMEOUT = 0.1       # Seconds returned by timeout() when nothing is pending
+
+TAP = "tap"
+DOUBLE_TAP = "double_tap"
+LONG_PRESS = "long_press"
+GESTURES = (TAP, DOUBLE_TAP, LONG_PRESS)
+
+
+class Action:
+    """ What a gesture does. undo compensates do, None if it cannot be taken back. """
+    __slots__ = ("name", "do", "undo")
+
+    def __init__(self, name: str, do, undo=None):
+        self.name = name
+        self.do = do
+        self.undo = undo
+
+    def __repr__(self):
+        return f"Action({self.name})"
+
+
+class SwitchGestures:
+    """ Gesture state machine of one switch, on the press and release timestamps.
+
+    When the tap action can be undone, the tap is speculative: it runs on
+    the press, without waiting for a possible double-tap or long-press, and
+    is undone if one of those completes. Otherwise the tap is deferred
+    until the other gestures are ruled out.
+    """
+    __slots__ = ("index", "actions", "double_tap_ns", "long_press_ns", "speculative",
+                 "pressed_at", "first_tap_at", "tap_done", "deferred_tap", "consumed")
+
+    def __init__(self, index: int, actions: dict, double_tap: float = DOUBLE_TAP_WINDOW,
+                 long_press: float = LONG_PRESS_TIME):
+        self.index = index
+        self.actions = actions  # gesture -> Action
+        self.double_tap_ns = int(double_tap * 1e9)
+        self.long_press_ns = int(long_press * 1e9)
+        tap = actions.get(TAP)
+        self.speculative = tap is None or tap.undo is not None
+        self.pressed_at = None     # Press time while held
+        self.first_tap_at = None   # Press time of a tap that may become a double-tap
+        self.tap_done = False      # The speculative tap of first_tap_at ran
+        self.deferred_tap = False  # A non-speculative tap waits for the other gestures to be ruled out
+        self.consumed = False      # The current press completed a gesture: nothing more until release
+
+    def _fire(self, gesture: str):
+        action = self.actions.get(gesture)
+        if action is not None:
+            logger.debug(f"Switch {self.index}: {gesture} -> {action.name}")
+            inc("gestures_total", (("switch", self.index), ("gesture", gesture)))
+            action.do()
+
+    def _retract_tap(self):
+        """Takes back a speculative tap, or drops a deferred one."""
+        if self.tap_done:
+            inc("gesture_retractions_total", (("switch", self.index),))
+            self.actions[TAP].undo()
+            self.tap_done = False
+        self.deferred_tap = False
+
+    def press(self, t_ns: int):
+        if (DOUBLE_TAP in self.actions and self.first_tap_at is not None
+                and t_ns - self.first_tap_at <= self.double_tap_ns):
+            self._retract_tap()
+            self._fire(DOUBLE_TAP)
+            self.first_tap_at = None
+            self.consumed = True
+        else:
+            self.first_tap_at = t_ns
+            self.consumed = False
+            if self.speculative:
+                self._fire(TAP)
+                self.tap_done = TAP in self.actions  # Until the next press: undone by a double-tap or long-press
+            else:
+                self.deferred_tap = True
+        self.pressed_at = t_ns
+
+    def release(self, t_ns: int):
+        self.pressed_at = None
+        self.poll(t_ns)
+
+    def poll(self, now_ns: int):
+        """Completes the gestures that depend on time passing: long-press, end of the double-tap window."""
+        if (self.pressed_at is not None and not self.consumed and LONG_PRESS in self.actions
+                and now_ns - self.pressed_at >= self.long_press_ns):
+            self._retract_tap()
+            self._fire(LONG_PRESS)
+            self.first_tap_at = None
+            self.consumed = True
+        if self.first_tap_at is not None and now_ns - self.first_tap_at > self.double_tap_ns:
+            self.first_tap_at = None  # No double-tap any more
+        if (self.deferred_tap and self.pressed_at is None
+                and (self.first_tap_at is None or DOUBLE_TAP not in self.actions)):
+            self.deferred_tap = False
+            self._fire(TAP)
+
+    def deadline(self):
+        """Next time (ns) poll() has something to decide, None if nothing is pending."""
+        deadlines = []
+        if self.pressed_at is not None and not self.consumed and LONG_PRESS in self.actions:
+            deadlines.append(self.pressed_at + self.long_press_ns)
+        if self.first_tap_at is not None:
+            deadlines.append(self.first_tap_at + self.double_tap_ns + 1)
+        return min(deadlines, default=None)
+
+
+class GestureEngine:
+    """ Gestures of all the switches, driven by the mapping stage.
+
+    press() and release() take the acquisition timestamps of the edges.
+    poll() is called after each batch of events and when timeout() expires.
+    """
+    def __init__(self):
+        self.switches = {}
+
+    def add(self, index: int, actions: dict, double_tap: float = DOUBLE_TAP_WINDOW,
+            long_press: float = LONG_PRESS_TIME) -> SwitchGestures:
+        switch = self.switches[index] = SwitchGestures(index, actions, double_tap, long_press)
+        return switch
+
+    def press(self, index: int, t_ns: int):
+        switch = self.switches.get(index)
+        if switch is not None:
+            switch.press(t_ns)
+
+    def release(self, index: int, t_ns: int):
+        switch = self.switches.get(index)
+        if switch is not None:
+            switch.release(t_ns)
+
+    def poll(self, now_ns: int = 0):
+        now_ns = now_ns or time.monotonic_ns()
+        for switch in self.switches.values():
+            if switch.deadline() is not None:
+                switch.poll(now_ns)
+
+    def timeout(self, now_ns: int = 0) -> float:
+        """Seconds until the next gesture deadline, at most IDLE_TIMEOUT."""
+        deadlines = [d for d in (switch.deadline() for switch in self.switches.values()) if d is not None]
+        if not deadlines:
+            return IDLE_TIMEOUT
+        now_ns = now_ns or time.monotonic_ns()
+        return min(IDLE_TIMEOUT, max(0.0, (min(deadlines) - now_ns) / 1e9))
+
+
+# === Main ===
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
+    state = {"effect": False}
+
+    def toggle():
+        state["effect"] = not state["effect"]
+        logger.info(f"effect {'on' if state['effect'] else 'off'}")
+
+    engine = GestureEngine()
+    engine.add(0, {TAP: Action("toggle", toggle, toggle),
+                   DOUBLE_TAP: Action("bank up", lambda: logger.info("bank up")),
+                   LONG_PRESS: Action("tuner", lambda: logger.info("tuner"))})
+    ms = 1_000_000
+    for label, events in (("tap", [(0, True), (80, False)]),
+                          ("double-tap", [(1000, True), (1080, False), (1200, True), (1280, False)]),
+                          ("long-press", [(2000, True), (2900, False)])):
+        logger.info(label)
+        for t, pressed in events:
+            engine.poll(t * ms)
+            (engine.press if pressed else engine.release)(0, t * ms)
+        engine.poll((events[-1][0] + 500) * ms)
+    logger.info(f"effect finally {'on' if state['effect'] else 'off'}")
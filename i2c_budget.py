@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""Static I2C bandwidth budget of a board configuration.
+
+    python3 i2c_budget.py                       # [acquisition] backend of multieffect.toml
+    python3 i2c_budget.py --acquisition interrupt --clock 100000
+    python3 i2c_budget.py --measure http://127.0.0.1:9108/metrics
+
+Counts the transactions each control loop does per iteration, as the
+Adafruit drivers do them, and derives transactions/s, bus occupancy and the
+worst-case latency of each control class. With --measure, compares with
+the I2C counters of a running daemon ([metrics] enabled).
+"""
+import argparse
+import logging
+import math
+import re
+import time
+import urllib.request
+
+from board_config import DEFAULT_CONFIG_PATH, load_board_config
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+
+ADS_DATA_RATE = 860      # Samples/s, as set by ExpressionPedal
+ADS_WAKEUP_US = 25       # Single-shot conversion start-up time
+TRANSACTION_OVERHEAD_US = 60.0  # Per transaction, Linux i2c-dev ioctl and driver (measured with i2c_profiler.py)
+UTILISATION_THRESHOLD = 0.5     # Warn above this bus occupancy
+
+# Loop periods (seconds) of the daemon
+BUTTONS_PERIOD = 0.01
+KEYPAD_PERIOD = 0.01
+JOYSTICK_PERIOD = 0.01
+PEDAL_PERIOD = 0.01
+ACQUISITION_PERIOD = 0.001  # Encoder acquisition workers
+INTERRUPT_RATE = 200        # INT assertions/s while turning encoders fast (interrupt acquisition)
+
+# Transaction shapes: (bytes written including the register, bytes read)
+GPIO_READ = (1, 2)   # MCP23017 GPIOA/B, 16 bits
+GPIO_WRITE = (3, 0)
+ADS_WRITE = (3, 0)   # ADS1115 config register
+ADS_READ = (1, 2)    # ADS1115 config or conversion register
+
+
+def transaction_us(shape, clock: int, overhead_us: float = TRANSACTION_OVERHEAD_US) -> float:
+    """Duration of one transaction: bits on the wire (9 per byte with ACK) plus the software overhead."""
+    written, read = shape
+    bits = 2 + 9 * (1 + written)  # START, address, data, STOP
+    if read:
+        bits += 1 + 9 * (1 + read)  # Repeated START, address, data
+    return bits / clock * 1e6 + overhead_us
+
+
+class ControlClass:
+    """ One control loop: its period and the transactions of one iteration """
+    def __init__(self, name: str, period: float, transactions, hold_lock: bool = False, rate: float = None):
+        self.name = name
+        self.period = period
+        self.transactions = transactions  # [(address, shape)]
+        self.hold_lock = hold_lock        # Transactions done under the ADC lock, blocking the other users
+        self.rate = rate if rate is not None else 1 / period  # Iterations doing the transactions per second
+
+    def iteration_us(self, clock, overhead_us):
+        return sum(transaction_us(shape, clock, overhead_us) for _, shape in self.transactions)
+
+    def longest_hold_us(self, clock, overhead_us):
+        """Longest time this loop keeps others from the bus."""
+        if self.hold_lock:
+            return self.iteration_us(clock, overhead_us)
+        return max((transaction_us(shape, clock, overhead_us) for _, shape in self.transactions), default=0.0)
+
+
+def ads_conversion(address: int, clock: int, overhead_us: float):
+    """Transactions of one single-shot AnalogIn read: config write, ready polls, conversion read."""
+    conversion_us = 1e6 / ADS_DATA_RATE + ADS_WAKEUP_US
+    polls = max(1, math.ceil(conversion_us / transaction_us(ADS_READ, clock, overhead_us)))
+    return [(address, ADS_WRITE)] + [(address, ADS_READ)] * (polls + 1)
+
+
+def control_classes(config, acquisition: str, clock: int, overhead_us: float):
+    """The control loops of the daemon for a board config and encoder acquisition backend."""
+    address = {name: chip.address for name, chip in config.chips.items()}
+    classes = []
+
+    if acquisition == "pin":
+        button_reads = [(address[fs["chip"]], GPIO_READ) for fs in config.footswitches]
+        button_reads += [(address[enc["chip"]], GPIO_READ) for enc in config.encoders]
+        classes.append(ControlClass("buttons", BUTTONS_PERIOD, button_reads))
+        for enc in config.encoders:
+            reads = [(address[enc["chip"]], GPIO_READ)] * 2  # clk and dt
+            classes.append(ControlClass(f"encoder cc {enc['cc']}", ACQUISITION_PERIOD, reads))
+        return classes + _other_classes(config, address, clock, overhead_us)
+
+    # Port snapshots of the chips with encoders or buttons, decoded for both
+    snapshot_chips = [config.chip(name) for name in
+                      dict.fromkeys([fs["chip"] for fs in config.footswitches] + [enc["chip"] for enc in config.encoders])]
+    if acquisition == "snapshot":
+        for chip in snapshot_chips:
+            classes.append(ControlClass(f"port {chip.name}", ACQUISITION_PERIOD, [(chip.address, GPIO_READ)]))
+    else:
+        # One port snapshot of each chip on a line per INT assertion, assertions spread over the lines
+        lines = {}
+        for chip in snapshot_chips:
+            if chip.int_pin:
+                lines.setdefault(chip.int_pin, []).append(chip)
+            else:
+                classes.append(ControlClass(f"port {chip.name}", ACQUISITION_PERIOD, [(chip.address, GPIO_READ)]))
+        for line, chips in lines.items():
+            classes.append(ControlClass(f"INT {line}", ACQUISITION_PERIOD,
+                                        [(chip.address, GPIO_READ) for chip in chips], rate=INTERRUPT_RATE / len(lines)))
+    return classes + _other_classes(config, address, clock, overhead_us)
+
+
+def _other_classes(config, address, clock: int, overhead_us: float):
+    """The keypad and ADS1115 loops, the same with every acquisition backend."""
+    classes = []
+    if config.keypad:
+        chip = address[config.keypad["chip"]]
+        row = [(chip, GPIO_READ), (chip, GPIO_WRITE)]  # Row low: read-modify-write of GPIO
+        row += [(chip, GPIO_READ)] * len(config.keypad["cols"])
+        row += [(chip, GPIO_READ), (chip, GPIO_WRITE)]  # Row back high
+        classes.append(ControlClass("keypad", KEYPAD_PERIOD, row * len(config.keypad["rows"])))
+
+    if config.joystick:
+        ads = config.adc(config.joystick["adc"])
+        transactions = ads_conversion(ads, clock, overhead_us) * 2 + [(address[config.joystick["chip"]], GPIO_READ)]
+        classes.append(ControlClass("joystick", JOYSTICK_PERIOD, transactions, hold_lock=True))
+
+    if config.pedal:
+        transactions = ads_conversion(config.adc(config.pedal["adc"]), clock, overhead_us)
+        classes.append(ControlClass("pedal", PEDAL_PERIOD, transactions, hold_lock=True))
+    return classes
+
+
+class Budget:
+    """ Expected bus load and worst-case latency of each control class """
+    def __init__(self, classes, clock: int, overhead_us: float = TRANSACTION_OVERHEAD_US):
+        self.classes = classes
+        self.clock = clock
+        self.overhead_us = overhead_us
+
+    def rows(self):
+        """[(class, transactions/s, bytes/s, occupancy, worst-case latency ms)]"""
+        rows = []
+        for cls in self.classes:
+            n_bytes = sum(written + read for _, (written, read) in cls.transactions)
+            iteration_us = cls.iteration_us(self.clock, self.overhead_us)
+            others = max((other.longest_hold_us(self.clock, self.overhead_us)
+                          for other in self.classes if other is not cls), default=0.0)
+            # Input changed just after being read: one period, a whole iteration, and the longest
+            # bus hold of another loop in front of it
+            latency_us = cls.period * 1e6 + iteration_us + others
+            rows.append((cls, len(cls.transactions) * cls.rate, n_bytes * cls.rate,
+                         iteration_us * cls.rate / 1e6, latency_us / 1000))
+        return rows
+
+    def by_address(self):
+        """Expected transactions/s per device address."""
+        rates = {}
+        for cls in self.classes:
+            for address, _ in cls.transactions:
+                rates[address] = rates.get(address, 0.0) + cls.rate
+        return rates
+
+    @property
+    def utilisation(self):
+        return sum(row[3] for row in self.rows())
+
+    def report(self, threshold: float = UTILISATION_THRESHOLD) -> str:
+        lines = [f"I2C budget at {self.clock / 1000:g} kHz, {self.overhead_us:g} µs overhead per transaction:",
+                 f"  {'control':<18} {'trans/s':>9} {'bytes/s':>9} {'bus %':>6} {'worst ms':>9}"]
+        for cls, transactions, n_bytes, occupancy, latency_ms in self.rows():
+            lines.append(f"  {cls.name:<18} {transactions:9.0f} {n_bytes:9.0f} {occupancy * 100:6.1f} {latency_ms:9.2f}")
+        total = self.utilisation
+        lines.append(f"  {'total':<18} {sum(r[1] for r in self.rows()):9.0f} {sum(r[2] for r in self.rows()):9.0f} "
+                     f"{total * 100:6.1f}")
+        if total > threshold:
+            lines.append(f"WARNING: bus occupancy {total * 100:.0f} % exceeds the {threshold * 100:.0f} % threshold"
+                         + (", the loops cannot keep their periods" if total > 1 else ""))
+        return "\n".join(lines)
+
+
+def measured_rates(url: str, seconds: float):
+    """Transactions/s per address, from two scrapes of a running daemon's metrics endpoint."""
+    pattern = re.compile(r'^kleagmfx_i2c_transactions_total\{address="0x([0-9a-f]+)"\} (\d+)', re.MULTILINE)
+
+    def scrape():
+        text = urllib.request.urlopen(url, timeout=5).read().decode()
+        return {int(address, 16): int(value) for address, value in pattern.findall(text)}
+
+    first = scrape()
+    time.sleep(seconds)
+    second = scrape()
+    return {address: (count - first.get(address, 0)) / seconds for address, count in second.items()}
+
+
+# === Main ===
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    parser = argparse.ArgumentParser(description="Static I2C bandwidth budget of a board configuration")
+    parser.add_argument("config", nargs="?", default=DEFAULT_CONFIG_PATH, help="board configuration file")
+    parser.add_argument("--acquisition", choices=("pin", "snapshot", "interrupt"), default=None,
+                        help="encoder acquisition (default: [acquisition] backend)")
+    parser.add_argument("--clock", type=int, default=None, help="bus clock in Hz (default: [i2c] clock)")
+    parser.add_argument("--overhead", type=float, default=TRANSACTION_OVERHEAD_US,
+                        help="software overhead per transaction, µs")
+    parser.add_argument("--threshold", type=float, default=UTILISATION_THRESHOLD, help="warning occupancy, 0..1")
+    parser.add_argument("--measure", metavar="URL", help="metrics endpoint of the running daemon to compare with")
+    parser.add_argument("--seconds", type=float, default=5.0, help="measurement duration")
+    args = parser.parse_args()
+
+    config = load_board_config(args.config)
+    clock = args.clock or config.i2c_clock
+    acquisition = args.acquisition or config.acquisition
+    budget = Budget(control_classes(config, acquisition, clock, args.overhead), clock, args.overhead)
+    print(budget.report(args.threshold))
+
+    if args.measure:
+        measured = measured_rates(args.measure, args.seconds)
+        expected = budget.by_address()
+        print(f"\nMeasured over {args.seconds:g} s (trans/s):")
+        print(f"  {'address':<8} {'expected':>9} {'measured':>9} {'ratio':>6}")
+        for address in sorted(set(expected) | set(measured)):
+            exp, meas = expected.get(address, 0.0), measured.get(address, 0.0)
+            print(f"  0x{address:02X}     {exp:9.0f} {meas:9.0f} {meas / exp if exp else float('nan'):6.2f}")
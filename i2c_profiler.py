@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+import logging
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+
+# Frames from these modules are skipped to find the control that caused a transaction
+LIBRARY_PREFIXES = ("adafruit_", "busio", "digitalio", "i2c_profiler", "metrics", "threading")
+REPORT_TOP = 15
+
+
+def _caller() -> str:
+    """Qualified name of the first function outside the I2C libraries, e.g. KeyPad.scan_keypad."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if not module.startswith(LIBRARY_PREFIXES):
+            return frame.f_code.co_qualname
+        frame = frame.f_back
+    return "?"
+
+
+class I2CProfiler:
+    """ busio.I2C wrapper recording every transaction, switchable at runtime.
+
+    When enabled, each writeto / readfrom_into / writeto_then_readfrom is
+    recorded with its device address, register (first byte written), byte
+    count, duration and calling control. Disabled, the cost is one
+    attribute test per transaction. report() ranks bus time by caller and
+    by register.
+    """
+    def __init__(self, i2c, enabled: bool = False):
+        self._i2c = i2c
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def __getattr__(self, name):
+        return getattr(self._i2c, name)
+
+    def reset(self):
+        with self._lock:
+            # (caller, address, register) -> [transactions, bytes, total ns, max ns]
+            self.records = {}
+            self.started = time.monotonic()
+
+    def toggle(self):
+        """Switches recording on or off. When switching off, logs the report."""
+        if self.enabled:
+            self.enabled = False
+            self.log_report()
+        else:
+            self.reset()
+            self.enabled = True
+            logger.info("I2C profiling on")
+
+    def _record(self, address, register, n_bytes, t0):
+        duration = time.perf_counter_ns() - t0
+        key = (_caller(), address, register)
+        with self._lock:
+            record = self.records.get(key)
+            if record is None:
+                record = self.records[key] = [0, 0, 0, 0]
+            record[0] += 1
+            record[1] += n_bytes
+            record[2] += duration
+            if duration > record[3]:
+                record[3] = duration
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        if not self.enabled:
+            return self._i2c.writeto(address, buffer, start=start, end=end)
+        t0 = time.perf_counter_ns()
+        result = self._i2c.writeto(address, buffer, start=start, end=end)
+        n_bytes = (len(buffer) if end is None else end) - start
+        self._record(address, buffer[start] if n_bytes else None, n_bytes, t0)
+        return result
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        if not self.enabled:
+            return self._i2c.readfrom_into(address, buffer, start=start, end=end)
+        t0 = time.perf_counter_ns()
+        result = self._i2c.readfrom_into(address, buffer, start=start, end=end)
+        self._record(address, None, (len(buffer) if end is None else end) - start, t0)
+        return result
+
+    def writeto_then_readfrom(self, address, buffer_out, buffer_in, *, out_start=0, out_end=None,
+                              in_start=0, in_end=None):
+        if not self.enabled:
+            return self._i2c.writeto_then_readfrom(address, buffer_out, buffer_in, out_start=out_start,
+                                                   out_end=out_end, in_start=in_start, in_end=in_end)
+        t0 = time.perf_counter_ns()
+        result = self._i2c.writeto_then_readfrom(address, buffer_out, buffer_in, out_start=out_start,
+                                                 out_end=out_end, in_start=in_start, in_end=in_end)
+        n_out = (len(buffer_out) if out_end is None else out_end) - out_start
+        n_in = (len(buffer_in) if in_end is None else in_end) - in_start
+        self._record(address, buffer_out[out_start] if n_out else None, n_out + n_in, t0)
+        return result
+
+    def ranking(self, by: str):
+        """[(key, transactions, bytes, total ns, max ns)] sorted by bus time. by: caller, register or device."""
+        with self._lock:
+            records = list(self.records.items())
+        totals = {}
+        for (caller, address, register), (count, n_bytes, total, longest) in records:
+            if by == "caller":
+                key = caller
+            elif by == "register":
+                key = f"0x{address:02X} reg {'-' if register is None else f'0x{register:02X}'}"
+            else:
+                key = f"0x{address:02X}"
+            total_record = totals.setdefault(key, [0, 0, 0, 0])
+            total_record[0] += count
+            total_record[1] += n_bytes
+            total_record[2] += total
+            total_record[3] = max(total_record[3], longest)
+        return sorted(((key, *values) for key, values in totals.items()), key=lambda r: r[3], reverse=True)
+
+    def report(self, top: int = REPORT_TOP) -> str:
+        elapsed = time.monotonic() - self.started
+        lines = []
+        for by in ("caller", "register", "device"):
+            ranking = self.ranking(by)
+            bus_ns = sum(r[3] for r in ranking)
+            lines.append(f"I2C bus time by {by} over {elapsed:.1f} s "
+                         f"({bus_ns / 1e9 / elapsed * 100 if elapsed else 0:.1f} % busy):")
+            lines.append(f"  {'':<40} {'trans/s':>8} {'bytes/s':>8} {'% bus':>6} {'avg µs':>7} {'max µs':>7}")
+            for key, count, n_bytes, total, longest in ranking[:top]:
+                lines.append(f"  {key:<40} {count / elapsed:8.1f} {n_bytes / elapsed:8.1f} "
+                             f"{total / bus_ns * 100 if bus_ns else 0:6.1f} {total / count / 1000:7.1f} {longest / 1000:7.1f}")
+        return "\n".join(lines)
+
+    def log_report(self):
+        logger.info(f"I2C profiling off\n{self.report()}")
+
+
+# === Main ===
+if __name__ == "__main__":
+    # Profiles the control loops talking to the real bus for a few seconds
+    import argparse
+
+    import adafruit_ads1x15.ads1115 as ADS
+    import board
+    import busio
+    import queue
+
+    from adafruit_mcp230xx.mcp23017 import MCP23017
+
+    from expression_pedal import ExpressionPedal
+    from fast_midi import FastMidiOut
+    from keypad import KeyPad
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Profile the I2C transactions of the keypad and the pedal")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    i2c = I2CProfiler(busio.I2C(board.SCL, board.SDA))
+    lock = threading.Lock()
+    midi_out = FastMidiOut('KleagMFX')
+    keypad = KeyPad(queue.Queue(), midi_out, MCP23017(i2c, address=0x21))
+    pedal = ExpressionPedal(midi_out, ADS.ADS1115(i2c), lock)
+    i2c.toggle()
+    threading.Thread(target=keypad.keypad_thread, daemon=True).start()
+    threading.Thread(target=pedal.poll, daemon=True).start()
+    time.sleep(args.seconds)
+    i2c.toggle()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Ranks the imports of the daemons by cost, from `python -X importtime`.
+
+    python3 import_profile.py                 # both daemons
+    python3 import_profile.py multieffect_int --top 15
+"""
+import argparse
+import logging
+import subprocess
+import sys
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+
+MODULES = ["multieffect", "multieffect_int"]
+TOP = 20
+
+
+def import_times(module: str, python: str = sys.executable):
+    """Imports module in a fresh interpreter. Returns [(self µs, cumulative µs, name)]."""
+    result = subprocess.run([python, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip()}")
+    entries = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # Header line
+        entries.append((int(fields[0]), int(fields[1]), fields[2].strip()))
+    return entries
+
+
+def report(module: str, top: int = TOP):
+    entries = import_times(module)
+    total = next((cumulative for _, cumulative, name in entries if name == module), 0)
+    print(f"\n{module}: {total / 1000:.1f} ms, {len(entries)} modules imported")
+    print(f"{'cumulative':>12} {'self':>10}  module")
+    for self_us, cumulative, name in sorted(entries, key=lambda e: e[1], reverse=True)[:top]:
+        print(f"{cumulative / 1000:9.1f} ms {self_us / 1000:7.1f} ms  {name}")
+    print(f"\nTop {top} by self time:")
+    for self_us, cumulative, name in sorted(entries, key=lambda e: e[0], reverse=True)[:top]:
+        print(f"{self_us / 1000:9.1f} ms  {name.strip()}")
+
+
+# === Main ===
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Rank the imports of the daemons by cost")
+    parser.add_argument("modules", nargs="*", default=MODULES, help="modules to import")
+    parser.add_argument("--top", type=int, default=TOP, help="number of modules listed")
+    args = parser.parse_args()
+    for module in args.modules:
+        report(module, args.top)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+
+EVENT_RING_SIZE = 256  # Number of preallocated event slots
+
+# Event kinds
+PRESS = 1    # Button pressed, value = button index
+RELEASE = 2  # Button released, value = button index
+STEP = 3     # Encoder step, value = direction (+1 / -1)
+MIDI_CC = 4       # Incoming control change, source = CC number
+MIDI_PROGRAM = 5  # Incoming program change, value = program
+
+
+class InputEvent:
+    """ Compact input event produced by the acquisition stage """
+    __slots__ = ("source", "kind", "value", "t_ns")
+
+    def __init__(self):
+        self.source = None
+        self.kind = 0
+        self.value = 0
+        self.t_ns = 0
+
+    def __repr__(self):
+        return f"InputEvent({self.source!r}, {self.kind}, {self.value}, {self.t_ns})"
+
+
+class InputEventRing:
+    """ Preallocated ring buffer between hardware acquisition and mapping/output.
+
+    Acquisition threads push events, a single mapping thread drains them in
+    batches. Slots are reused, so pushing does not allocate. When the ring is
+    full, the new event is dropped and counted in `overflows`.
+    """
+    def __init__(self, size: int = EVENT_RING_SIZE):
+        self.size = size
+        self._slots = [InputEvent() for _ in range(size)]
+        self._head = 0  # Next slot to read
+        self._tail = 0  # Next slot to write
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        # Counters
+        self.pushed = 0
+        self.drained = 0
+        self.overflows = 0
+        self.high_water = 0
+
+    def __len__(self):
+        return self._tail - self._head
+
+    def push(self, source, kind: int, value: int = 0, t_ns: int = 0) -> bool:
+        """Store an event, timestamped now unless t_ns is given. False on overflow."""
+        with self._lock:
+            pending = self._tail - self._head
+            if pending >= self.size:
+                self.overflows += 1
+                return False
+            slot = self._slots[self._tail % self.size]
+            slot.source = source
+            slot.kind = kind
+            slot.value = value
+            slot.t_ns = t_ns or time.monotonic_ns()
+            self._tail += 1
+            self.pushed += 1
+            if pending + 1 > self.high_water:
+                self.high_water = pending + 1
+        self._ready.set()
+        return True
+
+    def drain(self, handler, max_events: int = 0) -> int:
+        """Call handler(event) for pending events, oldest first. Returns the count.
+
+        The event objects are recycled afterwards: handlers must copy what they
+        want to keep.
+        """
+        with self._lock:
+            head = self._head
+            count = self._tail - head
+            if max_events and count > max_events:
+                count = max_events
+            self._ready.clear()
+        for i in range(count):
+            handler(self._slots[(head + i) % self.size])
+        with self._lock:
+            self._head = head + count
+            self.drained += count
+            if self._tail != self._head:
+                self._ready.set()
+        return count
+
+    def wait(self, timeout: float = None) -> bool:
+        """Block until at least one event is pending or the timeout expires."""
+        return self._ready.wait(timeout)
+
+    def wake(self):
+        """Ends a wait() without an event, for work handed to the consumer by other means."""
+        self._ready.set()
+
+    def stats(self):
+        return {
+            "pushed": self.pushed,
+            "drained": self.drained,
+            "overflows": self.overflows,
+            "high_water": self.high_water,
+            "pending": len(self),
+        }
+
+
+# === Main ===
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG)
+    ring = InputEventRing()
+    n = 100000
+
+    start = time.perf_counter()
+    for i in range(n):
+        ring.push(None, STEP, 1)
+        if len(ring) == ring.size:
+            ring.drain(lambda ev: None)
+    ring.drain(lambda ev: None)
+    elapsed = time.perf_counter() - start
+    logger.info(f"{n} events pushed and drained in {elapsed * 1000:.1f} ms "
+                f"({elapsed / n * 1e6:.2f} µs/event), stats: {ring.stats()}")
@@ -1,7 +1,5 @@
 #!/usr/bin/env python3
 import adafruit_ads1x15.ads1115 as ADS
-import board
-import busio
 import logging
 import math
 import threading
@@ -11,9 +9,11 @@ import uinput
 from adafruit_ads1x15.analog_in import AnalogIn
 from adafruit_mcp230xx.mcp23017 import MCP23017
 from digitalio import Direction, Pull
-from rich.console import Console
 from signal import pause
 
+from metrics import inc
+from supervisor import heartbeat
+
 
 logger = logging.getLogger(__name__)
 
@@ -25,34 +25,57 @@ class Joystick:
     POWER_CURVE = math.log(1/SENSITIVITY) / math.log(0.02)  # Exponent to match 1px/s at 0.02, 100px/s at 1.0
     LOOP_DELAY = 0.01  # General loop delay (seconds)
 
-    def __init__(self, ads: ADS.ADS1115, mcp: MCP23017, lock: threading.Lock, debug: bool = False):
+    def __init__(self, ads: ADS.ADS1115, mcp: MCP23017, lock: threading.Lock, debug: bool = False,
+                 sw_pin: int = 10, x_channel=ADS.P0, y_channel=ADS.P1, device=None,
+                 configure: bool = True, sensitivity: float = SENSITIVITY):
         self.debug = debug
+        self.set_sensitivity(sensitivity)
         # --- HARDWARE INITIALIZATION ---
         self.ads = ads
         self.lock = lock
-        # Use P0 and P1 for Joystick X and Y
-        self.joystick_x_axis = AnalogIn(ads, ADS.P0)
-        self.joystick_y_axis = AnalogIn(ads, ADS.P1)
+        # P0 and P1 by default for Joystick X and Y
+        self.joystick_x_axis = AnalogIn(ads, x_channel)
+        self._metric_labels = ((("channel", x_channel),), (("channel", y_channel),))
+        self.joystick_y_axis = AnalogIn(ads, y_channel)
 
 
         # --- JOYSTICK/MOUSE SETUP (retained ADS1115 usage) ---
-        events = (uinput.REL_X, uinput.REL_Y, uinput.BTN_LEFT, uinput.BTN_RIGHT, uinput.BTN_MIDDLE)
-        try:
-            self.device = uinput.Device(events)
-        except Exception as e:
-            logger.error(f"UInput device creation failed. Check permissions (sudo or your user in the input group setup with udev). Error: {e}")
-            exit(1)
+        self.device = device if device is not None else Joystick.create_device()
 
-        self.joystick_sw = mcp.get_pin(10)  # B2
-        self.joystick_sw.direction = Direction.INPUT
-        self.joystick_sw.pull = Pull.UP
+        self.joystick_sw = mcp.get_pin(sw_pin)  # B2 by default
+        if configure:  # Otherwise already done by ChipConfig.write_registers
+            self.joystick_sw.direction = Direction.INPUT
+            self.joystick_sw.pull = Pull.UP
         self.last_switch_state = True # True = not pressed
         self.last_x = 0
         self.last_y = 0
         self.spike_count_x = 0
         self.spike_count_y = 0
-        self.console = Console()
+        if debug:
+            from rich.console import Console  # Only needed for the debug status line
+            self.console = Console()
+
+
+    @staticmethod
+    def sensitivity_curve(sensitivity: float):
+        """(sensitivity, power curve) for a maximum speed in pixels/s, as stored in curve."""
+        if not sensitivity > 0:
+            raise ValueError(f"Joystick sensitivity must be positive, not {sensitivity}")
+        return (sensitivity, math.log(1/sensitivity) / math.log(Joystick.DEAD_ZONE))
 
+    def set_sensitivity(self, sensitivity: float):
+        """Maximum speed in pixels/s, and the matching power curve. Takes effect at the next read."""
+        self.curve = Joystick.sensitivity_curve(sensitivity)
+
+    @staticmethod
+    def create_device():
+        """Creates the virtual mouse. Independent of I2C, so it can be done beforehand."""
+        events = (uinput.REL_X, uinput.REL_Y, uinput.BTN_LEFT, uinput.BTN_RIGHT, uinput.BTN_MIDDLE)
+        try:
+            return uinput.Device(events)
+        except Exception as e:
+            logger.error(f"UInput device creation failed. Check permissions (sudo or your user in the input group setup with udev). Error: {e}")
+            raise
 
     def read_joystick(self):
         """Return normalized X, Y values in range -1.0 .. +1.0 using ADS1115."""
@@ -61,6 +84,8 @@ class Joystick:
         with self.lock:
             x = (self.joystick_x_axis.voltage - x_center) / x_center
             y = (self.joystick_y_axis.voltage - y_center) / y_center
+        inc("ads_conversions_total", self._metric_labels[0])
+        inc("ads_conversions_total", self._metric_labels[1])
         return max(-1, min(1, x)), max(-1, min(1, y))
 
     def calculate_speed(self, x, y):
@@ -81,6 +106,7 @@ class Joystick:
             self.spike_count_y = 0
 
         self.last_x, self.last_y = x, y
+        sensitivity, power_curve = self.curve  # One read: set_sensitivity may replace it
 
         # --- 2. Axial Dead Zone Logic ---
         # X Axis
@@ -88,19 +114,20 @@ class Joystick:
             dx = 0
         else:
             norm_x = (abs(x) - Joystick.DEAD_ZONE) / (1.0 - Joystick.DEAD_ZONE)
-            dx = math.pow(norm_x, Joystick.POWER_CURVE) * math.copysign(Joystick.SENSITIVITY, x)
+            dx = math.pow(norm_x, power_curve) * math.copysign(sensitivity, x)
 
         # Y Axis
         if abs(y) < Joystick.DEAD_ZONE:
             dy = 0
         else:
             norm_y = (abs(y) - Joystick.DEAD_ZONE) / (1.0 - Joystick.DEAD_ZONE)
-            dy = math.pow(norm_y, Joystick.POWER_CURVE) * math.copysign(Joystick.SENSITIVITY, y)
+            dy = math.pow(norm_y, power_curve) * math.copysign(sensitivity, y)
 
         return dx, dy
 
     def poll_joystick(self):
         while True:
+            heartbeat()
             # 1. Joystick Analog Control (Reads from ADS1115)
             x, y = self.read_joystick()
             # logger.debug(f"joystick {x},{y}")
@@ -110,6 +137,7 @@ class Joystick:
                 try:
                     self.device.emit(uinput.REL_X, int(-dx))
                     self.device.emit(uinput.REL_Y, int(-dy))
+                    inc("uinput_events_total", (("device", "joystick"),), 2)
                 except NameError as e: # Handle case where uinput device failed to initialize
                     logger.warn(f"Joystick.poll_joystick uinput failure: {e}")
 
@@ -120,6 +148,7 @@ class Joystick:
                 # logger.debug(f"joystick button new state: {uinput_state}")
                 try:
                     self.device.emit(uinput.BTN_MIDDLE, uinput_state)
+                    inc("uinput_events_total", (("device", "joystick"),))
                 except NameError as e:
                     logger.error(f"Name error in joystick button: {e}")
 
@@ -136,6 +165,9 @@ class Joystick:
 
 # === Main ===
 if __name__ == "__main__":
+    import board
+    import busio
+
     logging.basicConfig(level=logging.DEBUG)
         # --- HARDWARE INITIALIZATION ---
     i2c = busio.I2C(board.SCL, board.SDA)
@@ -1,8 +1,5 @@
 #!/usr/bin/env python3
-import board
-import busio
 import time
-import mido
 import queue
 import logging
 import threading
@@ -13,6 +10,10 @@ from digitalio import Direction, Pull
 from signal import pause
 from typing import List
 
+from fast_midi import FastMidiOut
+from metrics import inc
+from supervisor import heartbeat
+
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG)
 
@@ -32,7 +33,8 @@ class KeyPad:
         ['*', '0', '#', 'D']
     ]
 
-    def __init__(self, task_queue: queue.Queue, midi_out, mcp: MCP23017, row_pins: List[int] = KEYPAD_ROW_PINS, col_pins: List[int] = KEYPAD_COL_PINS):
+    def __init__(self, task_queue: queue.Queue, midi_out, mcp: MCP23017, row_pins: List[int] = KEYPAD_ROW_PINS, col_pins: List[int] = KEYPAD_COL_PINS,
+                 mouse=None, configure: bool = True):
         self.task_queue = task_queue
         self.last_key = None
         self.midi_out = midi_out
@@ -40,31 +42,38 @@ class KeyPad:
         self.digit_buffer = ""
         self.last_digit_time = 0.0
         self.pending_preset = False
+        self.on_pending = None  # Called with True when digits wait for DIGIT_SEQUENCE_TIMEOUT, False after
         self.left_state = False
         self.right_state = False
 
         # --- VIRTUAL MOUSE SETUP (buttons only) ---
-        try:
-            self.mouse = uinput.Device([
-                uinput.BTN_LEFT,
-                uinput.BTN_RIGHT,
-            ])
-        except Exception as e:
-            logger.error(f"KeyPad uinput init failed: {e}")
-            self.mouse = None
+        self.mouse = mouse if mouse is not None else KeyPad.create_mouse()
 
         kp_pins = row_pins + col_pins
 
         self.kp_rows = [self.mcp.get_pin(i) for i in row_pins]
         self.kp_cols = [self.mcp.get_pin(i) for i in col_pins]
 
-        for row in self.kp_rows:
-            row.direction = Direction.OUTPUT
-            row.value = True  # default HIGH
+        if configure:  # Otherwise already done by ChipConfig.write_registers
+            for row in self.kp_rows:
+                row.direction = Direction.OUTPUT
+                row.value = True  # default HIGH
+
+            for col in self.kp_cols:
+                col.direction = Direction.INPUT
+                col.pull = Pull.UP  # enable pull-ups
 
-        for col in self.kp_cols:
-            col.direction = Direction.INPUT
-            col.pull = Pull.UP  # enable pull-ups
+    @staticmethod
+    def create_mouse():
+        """Creates the virtual mouse buttons. Independent of I2C, so it can be done beforehand."""
+        try:
+            return uinput.Device([
+                uinput.BTN_LEFT,
+                uinput.BTN_RIGHT,
+            ])
+        except Exception as e:
+            logger.error(f"KeyPad uinput init failed: {e}")
+            return None
 
     def scan_keypad(self):
         for row_idx, row in enumerate(self.kp_rows):
@@ -79,18 +88,26 @@ class KeyPad:
 
     def set_bank(self, value: int):
         # logger.info(f"KeyPad.set_bank {value}")
+        self.midi_out.send_cc(0, 2)
+        self.midi_out.send_cc(32, value)
+        self.midi_out.send_program_change(0)
+        # Queued after sending so that the new preset is known when controls are reset
         self.task_queue.put(("reset", []))
-        self.midi_out.send(mido.Message('control_change', control=0, value=2))
-        self.midi_out.send(mido.Message('control_change', control=32, value=value))
-        self.midi_out.send(mido.Message('program_change', program=0))
 
     def set_preset(self, value: int):
         # logger.info(f"KeyPad.set_preset {value}")
+        self.midi_out.send_program_change(value)
         self.task_queue.put(("reset", []))
-        self.midi_out.send(mido.Message('program_change', program=value))
+
+    def set_pending(self, pending: bool):
+        if pending != self.pending_preset:
+            self.pending_preset = pending
+            if self.on_pending is not None:
+                self.on_pending(pending)
 
     def keypad_thread(self):
         while True:
+            heartbeat()
             # Keypad Scan
             key = self.scan_keypad()
             now = time.monotonic()
@@ -102,13 +119,13 @@ class KeyPad:
                     self.set_preset(preset)
                 finally:
                     self.digit_buffer = ""
-                    self.pending_preset = False
+                    self.set_pending(False)
 
             if key and key != self.last_key:
                 # logger.info(f"Key pressed: {key}")
                 if key in 'ABCD':
                     self.digit_buffer = ""
-                    self.pending_preset = False
+                    self.set_pending(False)
                     self.set_bank(ord(key) - ord('A'))
                 elif key in '0123456789':
                     if (now - self.last_digit_time) <= DIGIT_SEQUENCE_TIMEOUT:
@@ -117,17 +134,19 @@ class KeyPad:
                         self.digit_buffer = key
 
                     self.last_digit_time = now
-                    self.pending_preset = True
+                    self.set_pending(True)
                 elif key == '*' and self.mouse:
                     if not self.left_state:
                         logger.debug(f"Left button pressed")
                         self.mouse.emit(uinput.BTN_LEFT, 1)
+                        inc("uinput_events_total", (("device", "keypad"),))
                         self.mouse.syn() # Ensure the event is flushed to the OS immediately
                         self.left_state = True
                 elif key == '#' and self.mouse:
                     if not self.right_state:
                         logger.debug(f"Right button pressed")
                         self.mouse.emit(uinput.BTN_RIGHT, 1)
+                        inc("uinput_events_total", (("device", "keypad"),))
                         self.mouse.syn() # Ensure the event is flushed to the OS immediately
                         self.right_state = True
                 self.last_key = key
@@ -135,12 +154,14 @@ class KeyPad:
             elif key != '*' and self.left_state:
                 logger.debug(f"Left button released")
                 self.mouse.emit(uinput.BTN_LEFT, 0)
+                inc("uinput_events_total", (("device", "keypad"),))
                 self.mouse.syn()
                 self.left_state = False
 
             elif key != '#' and self.right_state:
                 logger.debug(f"Right button released")
                 self.mouse.emit(uinput.BTN_RIGHT, 0)
+                inc("uinput_events_total", (("device", "keypad"),))
                 self.mouse.syn()
                 self.right_state = False
 
@@ -152,10 +173,13 @@ class KeyPad:
 
 # === Main ===
 if __name__ == "__main__":
+    import board
+    import busio
+
     i2c = busio.I2C(board.SCL, board.SDA)
     mcp = MCP23017(i2c, address=0x21)
     # --- MIDI SETUP ---
-    midi_out = mido.open_output('KleagMFX', virtual=True)
+    midi_out = FastMidiOut('KleagMFX')
     task_queue = queue.Queue()
     keypad = KeyPad(task_queue, midi_out, mcp)
     threading.Thread(target=keypad.keypad_thread, daemon=True).start()
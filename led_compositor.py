@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+import logging
+import threading
+import time
+
+from supervisor import heartbeat
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+
+FRAME_RATE = 30  # Frames per second
+
+
+class Blink:
+    """ On for duty * period, then off, repeated from the time it was set """
+    __slots__ = ("period", "duty", "start")
+
+    def __init__(self, period: float = 0.5, duty: float = 0.5):
+        self.period = period
+        self.duty = duty
+        self.start = time.monotonic()
+
+    def __call__(self, now: float):
+        return (now - self.start) % self.period < self.duty * self.period
+
+
+class Pulse:
+    """ On for duration once, then transparent (the layers below show) """
+    __slots__ = ("duration", "start")
+
+    def __init__(self, duration: float = 0.05):
+        self.duration = duration
+        self.start = time.monotonic()
+
+    def __call__(self, now: float):
+        return True if now - self.start < self.duration else None
+
+
+class Solid:
+    """ Always on or always off """
+    __slots__ = ("on",)
+
+    def __init__(self, on: bool):
+        self.on = on
+
+    def __call__(self, now: float):
+        return self.on
+
+
+class LedCompositor:
+    """ Layers of patterns over the LEDs, evaluated at a fixed frame rate.
+
+    Each LED shows its own value (the effect state) unless layers are set
+    on it: then the most recently set layer whose pattern is not
+    transparent (returns None) wins. A pattern is any callable of the
+    monotonic time returning True, False or None. Each frame stores the
+    composed values as LED overlays and flushes the banks of the LEDs
+    that have layers: a LedBank only writes OLAT when a bit changed, so a
+    chip gets at most one write per frame however many LEDs are animated.
+    """
+    def __init__(self, frame_rate: float = FRAME_RATE):
+        self.frame_period = 1 / frame_rate
+        self.layers = {}  # LED -> {layer name: pattern}, in the order they were set
+        self._dirty = set()  # Banks whose LEDs lost their last layer
+        self._lock = threading.Lock()
+        self.frames = 0
+
+    def set(self, led, name: str, pattern):
+        """Adds or replaces the layer name of the LED, on top of the others."""
+        with self._lock:
+            layers = self.layers.setdefault(led, {})
+            layers.pop(name, None)
+            layers[name] = pattern
+
+    def clear(self, led, name: str):
+        with self._lock:
+            layers = self.layers.get(led)
+            if layers is None or layers.pop(name, None) is None:
+                return
+            if not layers:
+                del self.layers[led]
+                led.overlay = None
+                self._dirty.add(led.bank)
+
+    def frame(self, now: float = None):
+        """Composes and writes one frame. Returns the number of chips written."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            banks = self._dirty
+            self._dirty = set()
+            for led, layers in self.layers.items():
+                overlay = None
+                for pattern in reversed(layers.values()):
+                    overlay = pattern(now)
+                    if overlay is not None:
+                        break
+                led.overlay = overlay
+                banks.add(led.bank)
+        self.frames += 1
+        return sum(1 for bank in banks if bank is not None and bank.flush())
+
+    def frame_thread(self):
+        next_frame = time.monotonic()
+        while True:
+            heartbeat()
+            self.frame(next_frame)
+            next_frame += self.frame_period
+            delay = next_frame - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_frame = time.monotonic()  # Late: skip the missed frames instead of bursting
+
+
+# === Main ===
+if __name__ == "__main__":
+    import board
+    import busio
+
+    from adafruit_mcp230xx.mcp23017 import MCP23017
+
+    from mcp_led import LedBank, MCPLed
+
+    logging.basicConfig(level=logging.INFO)
+    mcp = MCP23017(busio.I2C(board.SCL, board.SDA), address=0x20)
+    leds = [MCPLed(mcp, pin) for pin in (4, 5, 12, 13)]
+    LedBank(mcp, leds)
+    compositor = LedCompositor()
+    for i, led in enumerate(leds):
+        compositor.set(led, "blink", Blink(0.2 * (i + 1)))
+    threading.Thread(target=compositor.frame_thread, daemon=True).start()
+    time.sleep(5)
+    logger.info(f"{compositor.frames} frames")
@@ -1,27 +1,63 @@
 #!/usr/bin/env python3
 import logging
+import time
 
 from adafruit_mcp230xx.mcp23017 import MCP23017
 from digitalio import Direction, Pull
 
+from debounce import DEBOUNCE_LOCKOUT, Debouncer
+from input_events import InputEventRing, PRESS, RELEASE
+from metrics import inc
+
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG)
 
 class MCPButton:
-    """ MCP23017 Button """
-    def __init__(self, mcp: MCP23017, pin: int):
+    """ MCP23017 Button, debounced.
+
+    Either polled with check(idx), or fed timestamped port snapshots with
+    update(snapshot, t_ns) by the acquisition workers (index must then be set).
+    """
+    def __init__(self, mcp: MCP23017, pin: int, events: InputEventRing = None, configure: bool = True,
+                 debounce: float = DEBOUNCE_LOCKOUT):
         # logger.info(f"MCPButton {pin}")
+        self.mcp = mcp
+        self.pin_num = pin
         self.pin = mcp.get_pin(pin)
-        self.pin.direction = Direction.INPUT
-        self.pin.pull = Pull.UP
+        if configure:  # Otherwise already done by ChipConfig.write_registers
+            self.pin.direction = Direction.INPUT
+            self.pin.pull = Pull.UP
         self.last_state = not self.pin.value # Active Low
+        self.debouncer = Debouncer(debounce, self.last_state)
         self.when_pressed = None
+        self.index = None  # Button index reported by update() and settle()
+        # When set, edges are queued for the mapping stage instead of calling when_pressed
+        self.events = events
 
     def check(self, idx: int):
-        current_state = not self.pin.value
-        # logger.info(f"MCPButton.check {idx}, {self.when_pressed}: {current_state} / {self.last_state}")
-        if current_state and not self.last_state:
-            if self.when_pressed:
-                self.when_pressed(idx)
-        self.last_state = current_state
+        self._sample(not self.pin.value, time.monotonic_ns(), idx)
+
+    def update(self, gpio_state: int, t_ns: int = 0):
+        """Handler for ChipConfig.dispatch: the pin's bit in a port snapshot read at t_ns."""
+        self._sample(not ((gpio_state >> self.pin_num) & 1), t_ns or time.monotonic_ns(), self.index)
 
+    def _sample(self, level: bool, t_ns: int, idx: int):
+        bounces = self.debouncer.bounces
+        if self.debouncer.sample(level, t_ns):
+            self._edge(idx, t_ns)
+        elif self.debouncer.bounces != bounces:
+            inc("switch_bounces_total", (("switch", idx),))
+
+    def settle(self, t_ns: int):
+        """Reports a level that changed during the lockout, once it is over. Called every acquisition period."""
+        if self.debouncer.settle(t_ns):
+            self._edge(self.index, t_ns)
+
+    def _edge(self, idx: int, t_ns: int):
+        current_state = self.debouncer.state
+        # logger.info(f"MCPButton edge {idx}, {self.when_pressed}: {current_state} / {self.last_state}")
+        if self.events is not None:
+            self.events.push(self, PRESS if current_state else RELEASE, idx, t_ns)
+        elif current_state and self.when_pressed:
+            self.when_pressed(idx)
+        self.last_state = current_state
@@ -1,14 +1,24 @@
 #!/usr/bin/env python3
+import threading
+
 from adafruit_mcp230xx.mcp23017 import MCP23017
 from digitalio import Direction
+from typing import List
+
+OLATA = 0x14  # Output latch, OLATB follows in sequential mode
 
 class MCPLed:
     """ MCP23017 LED """
-    def __init__(self, mcp: MCP23017, pin: int):
+    def __init__(self, mcp: MCP23017, pin: int, configure: bool = True):
+        self.mcp = mcp
+        self.pin_num = pin
         self.pin = mcp.get_pin(pin)
-        self.pin.direction = Direction.OUTPUT
         self._value = False
-        self.value = False
+        self.overlay = None  # Shown instead of the value when not None, set by LedCompositor
+        self.bank = None  # Set when the LED is part of a LedBank
+        if configure:  # Otherwise already an output, off, from ChipConfig.write_registers
+            self.pin.direction = Direction.OUTPUT
+            self.value = False
 
     @property
     def value(self):
@@ -17,5 +27,44 @@ class MCPLed:
     @value.setter
     def value(self, state):
         self._value = state
-        self.pin.value = state
+        if self.bank is not None:
+            self.bank.flush()
+        else:
+            self.pin.value = state
+
+    def stage(self, state):
+        """Sets the value without touching the chip: a LedBank.flush writes it."""
+        self._value = state
+
+
+class LedBank:
+    """ LEDs of one MCP23017 written together in a single OLAT write """
+    def __init__(self, mcp: MCP23017, leds: List[MCPLed]):
+        self.mcp = mcp
+        self.leds = leds
+        self.mask = 0
+        for led in leds:
+            self.mask |= 1 << led.pin_num
+            led.bank = self
+        self._lock = threading.Lock()
+        # Other output bits (power LED, ...) are kept as they are at creation time
+        self.olat = mcp._read_u16le(OLATA)
+
+    def flush(self):
+        """Writes all staged LED values at once. Returns True if the chip was written."""
+        with self._lock:
+            olat = self.olat & ~self.mask
+            for led in self.leds:
+                if led._value if led.overlay is None else led.overlay:
+                    olat |= 1 << led.pin_num
+            if olat == self.olat:
+                return False
+            self.mcp._write_u16le(OLATA, olat)
+            self.olat = olat
+            return True
 
+    def reset(self, olat: int):
+        """After the chip was reconfigured with OLAT = olat: writes the LED states again."""
+        with self._lock:
+            self.olat = olat
+        self.flush()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+import http.server
+import logging
+import os
+import socketserver
+import threading
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+
+PREFIX = "kleagmfx_"
+METRICS_ADDRESS = "127.0.0.1"
+METRICS_PORT = 9108
+
+# name -> help text, for the counters incremented with inc()
+COUNTERS = {
+    "i2c_transactions_total": "I2C transactions, by device address",
+    "i2c_bytes_total": "I2C bytes transferred, by device address and direction",
+    "ads_conversions_total": "ADS1115 conversions, by channel",
+    "midi_messages_total": "MIDI messages, by direction and CC (or program)",
+    "midi_echoes_total": "Received CCs checked against the sent ones, by result (suppressed echo or accepted)",
+    "pedal_groups_total": "Groups of pedal target CCs sent",
+    "encoder_steps_total": "Encoder detents, by encoder CC and direction",
+    "encoder_invalid_transitions_total": "Encoder quadrature transitions ignored as bounce, by encoder CC",
+    "uinput_events_total": "uinput events emitted, by device",
+    "gestures_total": "Gestures completed, by button index and gesture",
+    "gesture_retractions_total": "Speculative taps undone by a double-tap or long-press, by button index",
+    "switch_bounces_total": "Switch level changes ignored during the debounce lockout, by button index",
+}
+
+_local = threading.local()
+_shards = []  # One dict per thread that ever counted: (name, labels) -> value
+_shards_lock = threading.Lock()
+
+
+def _new_shard():
+    shard = _local.counts = {}
+    with _shards_lock:  # Once per thread
+        _shards.append(shard)
+    return shard
+
+
+def inc(name: str, labels: tuple = (), n: int = 1):
+    """Adds n to a counter. labels is a tuple of (label, value) pairs.
+
+    Lock-free: each thread only writes its own shard, the scrape sums them.
+    """
+    shard = getattr(_local, "counts", None)
+    if shard is None:
+        shard = _new_shard()
+    key = (name, labels)
+    shard[key] = shard.get(key, 0) + n
+
+
+def counters():
+    """Sums the per-thread shards: {(name, labels): value}."""
+    totals = {}
+    with _shards_lock:
+        shards = list(_shards)
+    for shard in shards:
+        for key, value in shard.copy().items():  # dict.copy() runs without releasing the GIL
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+class MeteredI2C:
+    """ busio.I2C wrapper counting transactions and bytes per device address """
+    def __init__(self, i2c):
+        self._i2c = i2c
+
+    def __getattr__(self, name):
+        return getattr(self._i2c, name)
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        inc("i2c_transactions_total", (("address", address),))
+        inc("i2c_bytes_total", (("address", address), ("direction", "write")),
+            (len(buffer) if end is None else end) - start)
+        return self._i2c.writeto(address, buffer, start=start, end=end)
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        inc("i2c_transactions_total", (("address", address),))
+        inc("i2c_bytes_total", (("address", address), ("direction", "read")),
+            (len(buffer) if end is None else end) - start)
+        return self._i2c.readfrom_into(address, buffer, start=start, end=end)
+
+    def writeto_then_readfrom(self, address, buffer_out, buffer_in, *, out_start=0, out_end=None,
+                              in_start=0, in_end=None):
+        inc("i2c_transactions_total", (("address", address),))
+        inc("i2c_bytes_total", (("address", address), ("direction", "write")),
+            (len(buffer_out) if out_end is None else out_end) - out_start)
+        inc("i2c_bytes_total", (("address", address), ("direction", "read")),
+            (len(buffer_in) if in_end is None else in_end) - in_start)
+        return self._i2c.writeto_then_readfrom(address, buffer_out, buffer_in, out_start=out_start,
+                                               out_end=out_end, in_start=in_start, in_end=in_end)
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for label, value in labels:
+        if label == "address":
+            value = f"0x{value:02x}"
+        parts.append(f'{label}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def render(supervisor=None, extra=None) -> str:
+    """Prometheus text exposition of the counters, the supervised loops and extra() gauges."""
+    lines = []
+    by_name = {}
+    for (name, labels), value in counters().items():
+        by_name.setdefault(name, []).append((labels, value))
+    for name in sorted(by_name):
+        lines.append(f"# HELP {PREFIX}{name} {COUNTERS.get(name, name)}")
+        lines.append(f"# TYPE {PREFIX}{name} counter")
+        for labels, value in sorted(by_name[name], key=lambda item: str(item[0])):
+            lines.append(f"{PREFIX}{name}{_labels(labels)} {value}")
+
+    if supervisor is not None:
+        from supervisor import HISTOGRAM_BUCKETS
+
+        lines.append(f"# HELP {PREFIX}loop_iteration_seconds Time between two iterations of each worker loop")
+        lines.append(f"# TYPE {PREFIX}loop_iteration_seconds histogram")
+        for worker in supervisor.workers:
+            stats = worker.stats
+            histogram = list(stats.histogram)
+            cumulative = 0
+            for bound, n in zip(HISTOGRAM_BUCKETS, histogram):
+                cumulative += n
+                lines.append(f'{PREFIX}loop_iteration_seconds_bucket{{loop="{worker.name}",le="{bound / 1e6:g}"}} {cumulative}')
+            cumulative += histogram[-1]
+            lines.append(f'{PREFIX}loop_iteration_seconds_bucket{{loop="{worker.name}",le="+Inf"}} {cumulative}')
+            lines.append(f'{PREFIX}loop_iteration_seconds_sum{{loop="{worker.name}"}} {stats.total_us / 1e6:g}')
+            lines.append(f'{PREFIX}loop_iteration_seconds_count{{loop="{worker.name}"}} {cumulative}')
+        for name, help_text, attribute in (("loop_iteration_max_seconds", "Longest iteration of each worker loop", None),
+                                           ("loop_restarts_total", "Restarts of each worker loop", "restarts")):
+            lines.append(f"# HELP {PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}{name} {'gauge' if attribute is None else 'counter'}")
+            for worker in supervisor.workers:
+                value = worker.stats.max_us / 1e6 if attribute is None else getattr(worker, attribute)
+                lines.append(f'{PREFIX}{name}{{loop="{worker.name}"}} {value:g}')
+
+    if extra is not None:
+        for name, value in extra().items():
+            lines.append(f"# TYPE {PREFIX}{name} gauge")
+            if isinstance(value, dict):  # {labels: value}
+                for labels, labelled in value.items():
+                    lines.append(f"{PREFIX}{name}{_labels(labels)} {labelled:g}")
+            else:
+                lines.append(f"{PREFIX}{name} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.server.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # No access log in the daemon journal
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ("local", 0)  # BaseHTTPRequestHandler expects a (host, port) pair
+
+
+class MetricsServer:
+    """ Serves render() over HTTP on a loopback port, or on a Unix socket if unix_socket is set """
+    def __init__(self, render, address: str = METRICS_ADDRESS, port: int = METRICS_PORT, unix_socket: str = None):
+        if unix_socket:
+            if os.path.exists(unix_socket):
+                os.unlink(unix_socket)
+            self.server = _UnixHTTPServer(unix_socket, _Handler)
+            self.where = unix_socket
+        else:
+            self.server = http.server.ThreadingHTTPServer((address, port), _Handler)
+            self.where = f"http://{address}:{port}/metrics"
+        self.server.daemon_threads = True
+        self.server.render = render
+
+    def serve_thread(self):
+        logger.info(f"Metrics served on {self.where}")
+        self.server.serve_forever()
+
+
+# === Main ===
+if __name__ == "__main__":
+    import time
+    import urllib.request
+
+    logging.basicConfig(level=logging.INFO)
+    n = 1_000_000
+    start = time.perf_counter()
+    for i in range(n):
+        inc("midi_messages_total", (("direction", "out"), ("cc", 20)))
+    logger.info(f"inc(): {(time.perf_counter() - start) / n * 1e9:.0f} ns")
+
+    server = MetricsServer(render, port=0)
+    threading.Thread(target=server.serve_thread, daemon=True).start()
+    port = server.server.server_address[1]
+    print(urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics").read().decode())
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+import collections
+import logging
+import threading
+import time
+
+from metrics import inc
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+
+ECHO_WINDOW = 0.05  # Seconds during which a received CC equal to one we sent is taken as its echo
+MAX_PENDING = 32    # Sent values remembered per CC
+
+
+class EchoLedger:
+    """ Recently sent (CC, value) pairs, to recognise Guitarix echoing them back.
+
+    record() notes each sent value with its time. is_echo() is asked for
+    each received CC: a value sent less than window ago is an echo, so it
+    is dropped together with the older values of that CC (their echoes
+    are behind it). While an encoder turns, the echoes of its previous
+    values arrive late and would otherwise set it back. Any other value
+    is a real change and is accepted.
+    """
+    def __init__(self, window: float = ECHO_WINDOW):
+        self.window_ns = int(window * 1e9)
+        self._sent = {}  # cc -> deque of (value, t_ns), oldest first
+        self._lock = threading.Lock()
+        self.suppressed = 0
+        self.accepted = 0
+
+    def record(self, cc: int, value: int, t_ns: int = 0):
+        t_ns = t_ns or time.monotonic_ns()
+        with self._lock:
+            pending = self._sent.get(cc)
+            if pending is None:
+                pending = self._sent[cc] = collections.deque(maxlen=MAX_PENDING)
+            pending.append((value, t_ns))
+
+    def is_echo(self, cc: int, value: int, t_ns: int = 0) -> bool:
+        t_ns = t_ns or time.monotonic_ns()
+        with self._lock:
+            pending = self._sent.get(cc)
+            echo = False
+            if pending:
+                while pending and t_ns - pending[0][1] > self.window_ns:
+                    pending.popleft()  # Expired
+                for i, (sent, _) in enumerate(pending):
+                    if sent == value:
+                        for _ in range(i + 1):
+                            pending.popleft()
+                        echo = True
+                        break
+        if echo:
+            self.suppressed += 1
+            inc("midi_echoes_total", (("result", "suppressed"),))
+        else:
+            self.accepted += 1
+            inc("midi_echoes_total", (("result", "accepted"),))
+        return echo
+
+
+class LedgerMidiOut:
+    """ MIDI output wrapper recording every sent CC in an EchoLedger """
+    def __init__(self, port, ledger: EchoLedger):
+        self.port = port
+        self.ledger = ledger
+
+    def send_cc(self, cc: int, value: int, channel: int = 0):
+        self.ledger.record(cc, value)
+        self.port.send_cc(cc, value, channel)
+
+    def send_ccs(self, group, channel: int = 0):
+        t_ns = time.monotonic_ns()
+        for cc, value in group:
+            self.ledger.record(cc, value, t_ns)
+        self.port.send_ccs(group, channel)
+
+    def send_program_change(self, program: int, channel: int = 0):
+        self.port.send_program_change(program, channel)
+
+    def send(self, msg):
+        if msg.type == 'control_change':
+            self.ledger.record(msg.control, msg.value)
+        self.port.send(msg)
+
+
+# === Main ===
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    ledger = EchoLedger()
+    ms = 1_000_000
+    # An encoder turned from 20 to 24, one step every 5 ms, Guitarix echoing each value 12 ms later
+    for i, value in enumerate(range(20, 25)):
+        ledger.record(20, value, i * 5 * ms)
+    for i, value in enumerate(range(20, 25)):
+        t = (i * 5 + 12) * ms
+        logger.info(f"{t // ms:3d} ms: received {value}: {'echo' if ledger.is_echo(20, value, t) else 'applied'}")
+    logger.info(f"200 ms: received 64: {'echo' if ledger.is_echo(20, 64, 200 * ms) else 'applied'}")
+    logger.info(f"{ledger.suppressed} suppressed, {ledger.accepted} accepted")
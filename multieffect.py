@@ -1,94 +1,215 @@
 #!/usr/bin/env python3
-import adafruit_ads1x15.ads1115 as ADS
-import board
-import busio
-import math
-import queue
-import time
-import uinput
-import mido
+import argparse
 import logging
-import subprocess
+import os
+import queue
+import signal
 import threading
+import time
+
+STARTED = time.monotonic()
 
-from adafruit_ads1x15.analog_in import AnalogIn
-from adafruit_mcp230xx.mcp23017 import MCP23017
-from digitalio import Direction, Pull
-from gpiozero import Button as GpioZeroButton, LED as GpioZeroLED
 from signal import pause
 
-from expression_pedal import ExpressionPedal
+from acquisition import BACKENDS
+from board_config import DEFAULT_CONFIG_PATH, load_board_config
+from expression_pedal import ExpressionPedal, MAX_GROUP_RATE, targets_from_config
+from fast_midi import FastMidiIn, FastMidiOut
+from gestures import Action, DOUBLE_TAP, GestureEngine, LONG_PRESS, TAP
+from i2c_profiler import I2CProfiler
+from input_events import InputEventRing, MIDI_PROGRAM, PRESS, RELEASE, STEP
 from joystick import Joystick
 from keypad import KeyPad
+from led_compositor import Blink, LedCompositor
+from metrics import MeteredI2C, MetricsServer, render
+from midi_echo import EchoLedger, LedgerMidiOut
 from mcp_button import MCPButton
-from mcp_led import MCPLed
-from rotary_encoder import RotaryEncoder
+from mcp_led import LedBank, MCPLed
+from pipewire_links import PipeWireLinkManager
+from preset_cache import ControlSnapshot, ObservedMidiOut, PresetCache
+from realtime import RealtimeMode, RT_PRIORITY
+from rotary_encoder_int import ENCODER_STEP, RotaryEncoder
+from sd_notify import sd_notify
+from staged_init import StagedInit
+from state_store import StateStore
+from supervisor import Supervisor, heartbeat
+from warm_start import StatePersister, load_state
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO, force=True)
 
 # --- CONFIGURATION ---
-SWITCH_CC = 64  # MIDI CC number for effect toggles
-ENCODER_CC_NUMBERS = [20, 21, 22, 23]  # MIDI CC for encoders
+PENDING_BLINK = 0.2  # Blink period (seconds) of the power LED while the keypad waits for more preset digits
+CONFIG_WATCH_PERIOD = 0.5  # Seconds between two checks of the board config modification time
 
-# Keypad/Power LED (Keep original GPIO)
-POWER_LED_PIN = 11
-
-# MCP23017 1 Button/LED Map
-BUTTON_PINS_MAP = [(1, 14), (1, 15), (1, 6), (1, 7)] # B6, B7, A6, A7
-LED_PINS_MAP = [(1, 13), (1, 12), (1, 4), (1, 5)] # B5, B4, A4, A5
+config = load_board_config()
+SWITCH_CC = config.switch_cc  # MIDI CC number for effect toggles
+ENCODER_CC_NUMBERS = config.encoder_ccs  # MIDI CC for encoders
 
 # --- MIDI/ENCODER LOGIC ---
-effect_states = [False] * 4 # Global state for MIDI toggles
+N_SWITCHES = len(config.footswitches) + len(config.encoders)  # Foot switches, then encoder push buttons
 
 def send_cc(cc, value):
-    msg = mido.Message('control_change', control=cc, value=value)
-    midi_out.send(msg)
+    midi_out.send_cc(cc, value)
 
 # --- BUTTON HANDLERS ---
 def handle_effect_toggle(idx):
-    # logger.info(f"handle_effect_toggle {idx}")
-    effect_states[idx] = not effect_states[idx]
-    if leds[idx] is not None:
-        leds[idx].value = effect_states[idx]
-    send_cc(SWITCH_CC + idx, 127 if effect_states[idx] else 0)
-    # logger.info(f"Button {idx} pressed. State: {effect_states[idx]}")
+    control_state.toggle(idx)
+
+def apply_state(snapshot, changed, sends):
+    """Outputs of a state commit, in the state owner thread: LEDs in one write per chip, then the toggles."""
+    for idx in changed:
+        if leds[idx] is not None:
+            leds[idx].stage(snapshot.effect_states[idx])
+    flush_leds()
+    for idx, on in sends:
+        send_cc(SWITCH_CC + idx, 127 if on else 0)
 
 
 def reset():
-    logger.info("reset")
-    for i in range(len(effect_states)):
-        effect_states[i] = False
-        if leds[i] is not None:
-            leds[i].value = False
+    """Restores the controls of the preset just selected, from the cache or all off."""
+    snapshot = preset_cache.lookup()
+    logger.info(f"reset to preset {preset_cache.key}: {snapshot}")
+    control_state.set_all(snapshot.effect_states if snapshot else ())
+    if snapshot:
+        for enc in encoders:
+            if enc.cc in snapshot.encoder_values:
+                enc.update_from_midi(snapshot.encoder_values[enc.cc])
+        if pedal is not None and snapshot.pedal_position is not None:
+            pedal.restore(snapshot.pedal_position)
+
+# --- GESTURES ---
+latched_ccs = {}  # CC -> state, for the "cc:N" gesture actions
+
+def toggle_cc(cc):
+    latched_ccs[cc] = not latched_ccs.get(cc, False)
+    send_cc(cc, 127 if latched_ccs[cc] else 0)
+
+def step_preset(direction):
+    keypad.set_preset((preset_cache.program + direction) % 128)
+
+def step_bank(direction):
+    keypad.set_bank(max(0, min(127, preset_cache.bank_lsb + direction)))
+
+def gesture_action(name, idx):
+    """Action named in the board config, for button idx."""
+    if name == "toggle":
+        return Action(name, lambda: handle_effect_toggle(idx), lambda: handle_effect_toggle(idx))
+    if name in ("preset_up", "preset_down", "bank_up", "bank_down"):
+        step = step_preset if name.startswith("preset") else step_bank
+        direction = 1 if name.endswith("up") else -1
+        return Action(name, lambda: step(direction), lambda: step(-direction))
+    if name.startswith("cc:"):
+        cc = int(name[3:])
+        return Action(name, lambda: toggle_cc(cc), lambda: toggle_cc(cc))
+    raise ValueError(f"Unknown gesture action {name!r} for button {idx}")
+
+def build_gestures(board) -> GestureEngine:
+    """Gesture engine of the foot switches then encoder buttons of a board config."""
+    engine = GestureEngine()
+    for i, control in enumerate(board.footswitches + board.encoders):
+        actions = {gesture: gesture_action(control[gesture], i)
+                   for gesture in (DOUBLE_TAP, LONG_PRESS) if control.get(gesture)}
+        actions[TAP] = gesture_action(control.get(TAP, "toggle"), i)
+        engine.add(i, actions, board.gestures.get("double_tap_ms", 300) / 1000,
+                   board.gestures.get("long_press_ms", 600) / 1000)
+    return engine
+
+def handle_input_event(event):
+    """Mapping stage: turns queued hardware events into state changes and MIDI."""
+    if event.kind == PRESS:
+        gestures.press(event.value, event.t_ns)
+    elif event.kind == RELEASE:
+        gestures.release(event.value, event.t_ns)
+    elif event.kind == STEP:
+        event.source.increment_cc_value(event.value)
+
+# --- WARM START ---
+def collect_state():
+    """Current control state, as saved by the persister thread."""
+    return {
+        "bank_msb": preset_cache.bank_msb,
+        "bank_lsb": preset_cache.bank_lsb,
+        "program": preset_cache.program,
+        "effect_states": list(control_state.snapshot.effect_states),
+        "encoder_values": {str(enc.cc): enc.midi_value for enc in encoders},
+        "pedal_position": pedal.position if pedal is not None else None,
+    }
+
+def saved_encoder_value(cc):
+    if saved_state is None:
+        return None
+    return saved_state.get("encoder_values", {}).get(str(cc))
+
+def restore_state(state):
+    """Puts the saved state back into the controls and LEDs. Nothing is sent: Guitarix already has it."""
+    snapshot = ControlSnapshot(N_SWITCHES)
+    for i, on in enumerate(state.get("effect_states", [])[:N_SWITCHES]):
+        snapshot.effect_states[i] = on
+    control_state.set_all(snapshot.effect_states)
+    control_state.process()  # The owner thread is not running yet
+    snapshot.encoder_values = {enc.cc: enc.midi_value for enc in encoders}
+    position = state.get("pedal_position", state.get("pedal_value"))  # pedal_value: older state files, also a position
+    if pedal is not None and position is not None:
+        pedal.restore(position)
+        snapshot.pedal_position = position
+    preset_cache.restore(state.get("bank_msb", 0), state.get("bank_lsb", 0), state.get("program", 0), snapshot)
+    logger.info(f"Warm start: preset {preset_cache.key} restored, {snapshot}")
 
 # --- THREADS ---
 
-def midi_input_thread():
-    # logger.info("Listening for incoming MIDI messages...")
-    for msg in midi_in:
-        if msg.type == 'control_change':
-            # logger.info(f"midi_input_thread received: {msg}")
-            # Update Effect States (SWITCH_CC)
-            if SWITCH_CC <= msg.control <= SWITCH_CC + 3:
-                idx = msg.control - SWITCH_CC
-                new_state = msg.value > 0
-
-                # Only update if the state actually changed to avoid flickering
-                if effect_states[idx] != new_state:
-                    effect_states[idx] = new_state
-                    if leds[idx] is not None:
-                        leds[idx].value = new_state
-                # logger.debug(f"Sync: LED {idx} set to {new_state} via MIDI")
-            # Update Encoder CC Value if received externally
-            if msg.control in ENCODER_CC_NUMBERS:
-                for enc in encoders:
-                    if enc.cc == msg.control:
-                        enc.update_from_midi(msg.value)
-                        break
+def mapping_thread():
+    while True:
+        heartbeat()
+        input_events.wait(gestures.timeout())
+        input_events.drain(handle_input_event)
+        gestures.poll()
+        while not pending_reloads.empty():  # Between two batches: no event sees half a config
+            pending_reloads.get()()
+
+def handle_midi_event(event):
+    """Collects a message received from Guitarix into the burst delta, see apply_midi_burst."""
+    if event.kind == MIDI_PROGRAM:
+        preset_cache.observe_program(event.value)
+        return
+    cc = event.source
+    if echo_ledger.is_echo(cc, event.value, event.t_ns):  # Age at arrival, not when the burst is applied
+        return  # Guitarix repeating what we sent: already in the cache and the controls
+    preset_cache.observe_cc(cc, event.value)
+    # Update Effect States (SWITCH_CC)
+    switch_cc = SWITCH_CC  # Once: a reload may change it
+    if switch_cc <= cc < switch_cc + len(config.footswitches):
+        midi_effects[cc - switch_cc] = event.value > 0
+    # Update Encoder CC Value if received externally
+    enc = encoders_by_cc.get(cc)
+    if enc is not None:
+        midi_encoder_values[enc] = event.value
+
+def apply_midi_burst():
+    """Applies the last value of each control in a burst: one state commit (one LED flush), one encoder pass."""
+    if midi_effects:
+        # Only changed states reach the LEDs, see apply_state
+        control_state.set_effects(midi_effects)
+        midi_effects.clear()
+    for enc, value in midi_encoder_values.items():
+        enc.update_from_midi(value)
+    midi_encoder_values.clear()
+
+def flush_leds():
+    """Writes the staged LED states, one write per chip."""
+    for bank in led_banks:
+        bank.flush()
+
+def show_preset_pending(pending):
+    """Blinks the power LED while the keypad waits for more preset digits."""
+    if pending:
+        compositor.set(power_led, "preset pending", Blink(PENDING_BLINK))
+    else:
+        compositor.clear(power_led, "preset pending")
 
 def buttons_thread():
     while True:
+        heartbeat()
         # MCP Button Scan
         for i, btn in enumerate(buttons):
             btn.check(i)
@@ -99,11 +220,14 @@ def main_thread_loop():
     # logger.info("\n[Main Thread] Starting queue processor...")
 
     while True:
+        heartbeat()
         while not task_queue.empty():
             try:
                 func, args = task_queue.get(timeout=0.1)
                 if func == "reset":
                     reset(*args)
+                elif func == "reload":
+                    reload_config()
 
                 task_queue.task_done()
             except queue.Empty:
@@ -111,87 +235,341 @@ def main_thread_loop():
                 pass
         time.sleep(0.001)
 
-def link_pipewire_ports():
+# --- HOT RELOAD ---
+def reload_config():
+    """Re-reads the board config and hands the new mapping to mapping_thread. MIDI ports, PipeWire links,
+    uinput devices and I2C setup stay as they are: a change needing them is refused, until a restart."""
+    started = time.monotonic()
     try:
-        # Link Script -> Guitarix
-        subprocess.run(['pw-link', 'Midi-Bridge:RtMidiOut Client:(capture_0) KleagMFX', 'gx_head_amp:midi_in_1'], check=False)
-        # Link Guitarix -> Script
-        subprocess.run(['pw-link', 'gx_head_amp:midi_out_1', 'Midi-Bridge:RtMidiIn Client:(playback_0) KleagMFX'], check=False)
-        logger.info("PipeWire MIDI ports linked successfully.")
-    except Exception as e:
-        logger.error(f"Failed to link PipeWire ports: {e}")
-
+        new = load_board_config(DEFAULT_CONFIG_PATH)
+        changed = config.hardware_changes(new)
+        if changed:
+            logger.warning(f"Config not reloaded, restart needed for: {', '.join(changed)}")
+            return
+        swap = prepare_config(new)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.error(f"Config not reloaded: {e}")
+        return
+    new.chips = config.chips  # Same registers, and the acquisition dispatches through these
+    pending_reloads.put(lambda: apply_config(new, swap, started))
+    input_events.wake()
+
+def check_range(name, value, low, high=None):
+    if not (low <= value and (high is None or value <= high)):
+        raise ValueError(f"{name} = {value} out of range {low}..{'' if high is None else high}")
+    return value
+
+def prepare_config(new) -> dict:
+    """Checks a reloaded config and computes everything apply_config assigns. ValueError if a value is bad."""
+    check_range("switch_cc", new.switch_cc, 0, 128 - N_SWITCHES)
+    check_range("[debounce] lockout_ms", new.debounce_ms, 0)
+    swap = {
+        "lockouts": [int(check_range(f"debounce_ms of {control.get('name', f'footswitch {i}')}", control["debounce_ms"], 0) * 1e6)
+                     if "debounce_ms" in control else int(new.debounce_ms * 1e6)
+                     for i, control in enumerate(new.footswitches + new.encoders)],
+        "encoders": [(check_range("encoder cc", enc["cc"], 0, 127), check_range("step", enc.get("step", ENCODER_STEP), 1, 127))
+                     for enc in new.encoders],
+        "gestures": build_gestures(new),
+        "echo_window_ns": int(check_range("echo_window_ms", new.echo_window_ms, 0) * 1e6),
+        "batch_window": check_range("batch_window_ms", new.midi_batch_window_ms, 0) / 1000,
+        "max_hold": check_range("max_hold_ms", new.midi_max_hold_ms, 0) / 1000,
+    }
+    swap["max_hold"] = max(swap["max_hold"], swap["batch_window"])
+    if joystick is not None:
+        swap["joystick_curve"] = Joystick.sensitivity_curve(new.joystick.get("sensitivity", Joystick.SENSITIVITY))
+    if pedal is not None:
+        max_rate = new.pedal.get("max_rate", MAX_GROUP_RATE)
+        if not max_rate > 0:
+            raise ValueError(f"pedal max_rate must be positive, not {max_rate}")
+        swap["pedal_min_interval"] = 1 / max_rate
+        swap["pedal_targets"] = targets_from_config(new.pedal)
+        for target in swap["pedal_targets"]:
+            check_range("pedal cc", target.cc, 0, 127)
+            check_range(f"pedal cc {target.cc} value", min(target.lut), 0, 127)
+            check_range(f"pedal cc {target.cc} value", max(target.lut), 0, 127)
+    return swap
+
+def apply_config(new, swap, started):
+    """Swaps in a config checked by prepare_config, in mapping_thread. Only assignments: it cannot fail halfway."""
+    global config, SWITCH_CC, ENCODER_CC_NUMBERS, encoders_by_cc, gestures
+    for btn, lockout_ns in zip(buttons, swap["lockouts"]):
+        btn.debouncer.lockout_ns = lockout_ns
+    for encoder, (cc, step_size) in zip(encoders, swap["encoders"]):
+        encoder.cc = cc
+        encoder.step_size = step_size
+    encoders_by_cc = {enc.cc: enc for enc in encoders}
+    SWITCH_CC, ENCODER_CC_NUMBERS = new.switch_cc, new.encoder_ccs
+    preset_cache.switch_cc, preset_cache.encoder_ccs = SWITCH_CC, set(ENCODER_CC_NUMBERS)
+    gestures = swap["gestures"]
+    if joystick is not None:
+        joystick.curve = swap["joystick_curve"]
+    if pedal is not None:
+        pedal.min_interval = swap["pedal_min_interval"]
+        pedal.set_targets(swap["pedal_targets"])
+    echo_ledger.window_ns = swap["echo_window_ns"]
+    midi_in.batch_window = swap["batch_window"]
+    midi_in.max_hold = swap["max_hold"]
+    config = new
+    logger.info(f"Config reloaded in {(time.monotonic() - started) * 1000:.1f} ms")
+
+def config_watch_thread():
+    """Reloads the board config when its file changes."""
+    def mtime():
+        try:
+            return os.stat(DEFAULT_CONFIG_PATH).st_mtime_ns
+        except OSError:
+            return None
+    last = mtime()
+    while True:
+        heartbeat()
+        time.sleep(CONFIG_WATCH_PERIOD)
+        current = mtime()
+        if current != last and current is not None:
+            logger.info(f"{DEFAULT_CONFIG_PATH} changed")
+            task_queue.put(("reload", ()))
+        last = current
+
+# --- RUNTIME STATE ---
+# Pure Python objects are created at import, hardware ones by the init stages run from main()
+
+# Links to Guitarix, (re)established whenever its ports appear
+link_manager = PipeWireLinkManager(config.pipewire_links)
+# Control state of each preset, filled from outgoing and incoming MIDI
+preset_cache = PresetCache(SWITCH_CC, N_SWITCHES, ENCODER_CC_NUMBERS)
+# Effect states: every thread submits, the state owner thread applies and drives LEDs and toggles
+control_state = StateStore(N_SWITCHES, apply_state)
+# Received burst being collected by midi_in.dispatch_thread: switch -> state, encoder -> value
+midi_effects = {}
+midi_encoder_values = {}
+# Sent CCs, to drop their echoes from Guitarix
+echo_ledger = EchoLedger(config.echo_window_ms / 1000)
+# Acquisition threads push here, mapping_thread applies
+input_events = InputEventRing()
+# LED animations over the effect states, one frame every 1 / frame_rate seconds
+compositor = LedCompositor(config.led_frame_rate)
+# Tap, double-tap and long-press of each button, applied by mapping_thread
+gestures = GestureEngine()
+# Reloaded configs, swapped in by mapping_thread
+pending_reloads = queue.SimpleQueue()
+adc_locks = {name: threading.Lock() for name in config.adcs}  # One conversion at a time per ADS1115
+task_queue = queue.Queue()
+# Saved to config.state_path when it changes, restored at startup
+persister = StatePersister(collect_state, config.state_path, config.state_interval)
+saved_state = None  # Loaded by main() before the controls are created
+# Restarts the worker loops that die or stall, feeds the systemd watchdog
+supervisor = Supervisor(recover=lambda: recover_bus())
+
+midi_out = None
+midi_in = None
+i2c = None
+power_led = None
+MCP_MAP = {}
+ADS_MAP = {}
+buttons = []
+leds = []
+encoders = []
+encoders_by_cc = {}
+led_banks = []
+joystick = None
+keypad = None
+pedal = None
+joystick_device = None  # uinput devices, created while I2C is set up
+keypad_mouse = None
+acquisition = None  # AcquisitionBackend chosen in main()
+
+def recover_bus():
+    """After an I2C failure: rewrites the chip registers (a glitch may have reset them) and the LEDs."""
+    for name, chip in config.chips.items():
+        chip.write_registers(MCP_MAP[name], interrupts=acquisition.interrupts)
+        for bank in led_banks:
+            if bank.mcp is MCP_MAP[name]:
+                bank.reset(chip.olat)
+    acquisition.recover()
+
+def link_gauges():
+    """PipeWire link state and metrics, labelled by link."""
+    stats = link_manager.stats()
+    def gauge(key, convert=float):
+        return {(("link", name),): convert(link[key]) for name, link in stats.items() if link[key] is not None}
+    return {
+        "pipewire_link_up": gauge("linked", int),
+        "pipewire_link_time_to_link_seconds": gauge("time_to_link"),
+        "pipewire_link_links": gauge("link_count"),
+        "pipewire_link_disconnects": gauge("disconnects"),
+        "pipewire_link_failures": gauge("failures"),
+    }
+
+def render_metrics():
+    return render(supervisor, lambda: {
+        "input_events_pending": len(input_events),
+        "input_events_high_water": input_events.high_water,
+        "input_events_overflows": input_events.overflows,
+        "supervisor_healthy": int(supervisor.healthy),
+        **link_gauges(),
+    })
 
 # --- MIDI SETUP ---
-midi_out = mido.open_output('KleagMFX', virtual=True)
-midi_in = mido.open_input('KleagMFX', virtual=True)
+def init_midi():
+    global midi_out, midi_in
+    midi_out = ObservedMidiOut(LedgerMidiOut(FastMidiOut('KleagMFX'), echo_ledger), preset_cache)
+    # Incoming messages are collected in bursts and applied by midi_in.dispatch_thread
+    midi_in = FastMidiIn(handle_midi_event, apply_midi_burst, 'KleagMFX',
+                         config.midi_batch_window_ms / 1000, config.midi_max_hold_ms / 1000)
 
 # --- HARDWARE INITIALIZATION ---
-i2c = busio.I2C(board.SCL, board.SDA)
-i2c_lock = threading.Lock()
-
-# ADS1115 for Joystick (kept as requested)
-ads = ADS.ADS1115(i2c)
-
-# MCP23017
-mcp1 = MCP23017(i2c, address=0x20)
-mcp2 = MCP23017(i2c, address=0x21)
-MCP_MAP = {1: mcp1, 2: mcp2}
-
-# Power LED
-power_led = mcp1.get_pin(POWER_LED_PIN)
-power_led.direction = Direction.OUTPUT
-power_led.value = True
-
-# Foot switches and their associated LED
-buttons = [MCPButton(MCP_MAP[mcp], pin) for mcp, pin in BUTTON_PINS_MAP]
-leds = [MCPLed(MCP_MAP[mcp], pin) for mcp, pin in LED_PINS_MAP]
-
-# Board label: as visible on physical pedalboard: mcp number and mcp pins map
-# RotaryEncoder4: 1st from left to right above : mcp n°2 clk B4=12 dt B3=11 sw B2=10
-# RotaryEncoder3: 2nd from left to right above : mcp n°2 clk B7=15 dt B6=14 sw B5=13
-# RotaryEncoder2: 3rd from left to right above : mcp n°1 clk A3=3  dt A2=2  sw A1=1
-# RotaryEncoder1: 4th from left to right above : mcp n°1 clk A0=0, dt B0=8, sw B1=9
-# --- ROTARY ENCODERS ---
-encoder_configs = [
-    (mcp1, 0,   8,  9, "Encoder 0", ENCODER_CC_NUMBERS[0]), # CC 20
-    (mcp1, 3,   2,  1, "Encoder 1", ENCODER_CC_NUMBERS[1]), # CC 21
-    (mcp2, 15, 14, 13, "Encoder 2", ENCODER_CC_NUMBERS[2]), # CC 22
-    (mcp2, 12, 11, 10, "Encoder 3", ENCODER_CC_NUMBERS[3]), # CC 23
-]
-encoders = []
-for mcp, clk_pin, dt_pin, sw_pin, name, cc in encoder_configs:
-    encoder = RotaryEncoder(midi_out, mcp, name, clk_pin, dt_pin, sw_pin, cc)
-    encoders.append(encoder)
-    buttons.append(encoder.button)
-    effect_states.append(False)
-    leds.append(None)
-
-
-for i, btn in enumerate(buttons):
-    btn.when_pressed = handle_effect_toggle
-
+def init_uinput():
+    global joystick_device, keypad_mouse
+    joystick_device = Joystick.create_device()
+    keypad_mouse = KeyPad.create_mouse()
+
+def init_i2c():
+    """Opens the bus and configures the chips."""
+    global i2c, power_led
+    import adafruit_ads1x15.ads1115 as ADS
+    import board
+    import busio
+
+    from adafruit_mcp230xx.mcp23017 import MCP23017
+
+    # Transactions by caller and register, switched with SIGUSR1
+    i2c = I2CProfiler(busio.I2C(board.SCL, board.SDA), config.profile_i2c)
+    if config.metrics.get("enabled"):
+        i2c = MeteredI2C(i2c)  # Counts transactions and bytes per device address
+
+    # ADS1115 for Joystick and expression pedal
+    ADS_MAP.update({name: ADS.ADS1115(i2c, address=address) for name, address in config.adcs.items()})
+
+    # MCP23017
+    # No reset: the whole register image compiled from the board config is written below
+    MCP_MAP.update({name: MCP23017(i2c, address=chip.address, reset=False) for name, chip in config.chips.items()})
+
+    # IODIR, IPOL, GPINTEN (interrupt acquisition only), DEFVAL, INTCON, IOCON, GPPU and OLAT in two writes per chip
+    for name, chip in config.chips.items():
+        chip.write_registers(MCP_MAP[name], interrupts=acquisition.interrupts, verify=config.verify_registers)
+
+    # Power LED, switched on by the OLAT image
+    power_led = MCPLed(MCP_MAP[config.power_led["chip"]], config.power_led["pin"], configure=False)
+    power_led.stage(True)
+
+def init_controls():
+    """Creates the MCP23017 controls. Needs init_midi() and init_i2c()."""
+    global gestures
+    # Foot switches and their associated LED
+    for fs in config.footswitches:
+        buttons.append(MCPButton(MCP_MAP[fs["chip"]], fs["pin"], input_events, configure=False,
+                                 debounce=config.debounce(fs)))
+        leds.append(MCPLed(MCP_MAP[fs["chip"]], fs["led"], configure=False) if fs.get("led") is not None else None)
+
+    # --- ROTARY ENCODERS ---
+    for enc in config.encoders:
+        encoder = RotaryEncoder(midi_out, MCP_MAP[enc["chip"]], enc["name"], enc["clk"], enc["dt"], enc["sw"],
+                                enc["cc"], input_events, configure=False, initial_value=saved_encoder_value(enc["cc"]),
+                                debounce=config.debounce(enc), step_size=enc.get("step", ENCODER_STEP))
+        encoders.append(encoder)
+        buttons.append(encoder.button)
+        leds.append(None)
+
+    encoders_by_cc.update({enc.cc: enc for enc in encoders})
+
+    # LEDs of each chip, written together by flush_leds()
+    for mcp in MCP_MAP.values():
+        chip_leds = [led for led in leds + [power_led] if led is not None and led.mcp is mcp]
+        if chip_leds:
+            led_banks.append(LedBank(mcp, chip_leds))
+
+    for i, btn in enumerate(buttons):
+        btn.when_pressed = handle_effect_toggle
+        btn.index = i
+    gestures = build_gestures(config)
+
+    acquisition.setup(encoders, buttons)
+
+def init_analog_controls():
+    """Creates the ADS1115 controls and the keypad. Needs init_controls() and init_uinput()."""
+    global joystick, keypad, pedal
+    joystick = Joystick(ADS_MAP[config.joystick["adc"]], MCP_MAP[config.joystick["chip"]],
+                        lock=adc_locks[config.joystick["adc"]], sw_pin=config.joystick["sw"],
+                        x_channel=config.joystick["x_channel"], y_channel=config.joystick["y_channel"],
+                        device=joystick_device, configure=False,
+                        sensitivity=config.joystick.get("sensitivity", Joystick.SENSITIVITY))
+    keypad = KeyPad(task_queue, midi_out, MCP_MAP[config.keypad["chip"]], config.keypad["rows"], config.keypad["cols"],
+                    keypad_mouse, configure=False)
+    keypad.on_pending = show_preset_pending
+    pedal = ExpressionPedal(midi_out, ADS_MAP[config.pedal["adc"]], lock=adc_locks[config.pedal["adc"]],
+                            channel=config.pedal["channel"], targets=targets_from_config(config.pedal),
+                            max_rate=config.pedal.get("max_rate", MAX_GROUP_RATE))
+    pedal.on_position = preset_cache.observe_pedal
 
 # === Main ===
-if __name__ == "__main__":
-    link_pipewire_ports()
-    task_queue = queue.Queue()
-    joystick = Joystick(ads, mcp1, lock=i2c_lock)
-    keypad = KeyPad(task_queue, midi_out, mcp2)
-    pedal = ExpressionPedal(midi_out, ads, lock=i2c_lock, channel=ADS.P2)
-
-    threading.Thread(target=midi_input_thread, daemon=True).start()
-    threading.Thread(target=buttons_thread, daemon=True).start()
-    threading.Thread(target=joystick.poll_joystick, daemon=True).start()
-    threading.Thread(target=keypad.keypad_thread, daemon=True).start()
-    threading.Thread(target=pedal.poll, daemon=True).start()
-
-    for encoder in encoders:
-        threading.Thread(target=encoder.poll_thread, daemon=True).start()
-    threading.Thread(target=main_thread_loop, daemon=True).start()
-
-    logger.info("Kleag's Multi-effect daemon running.")
+def terminate(signum, frame):
+    logger.info(f"Kleag's Multi-effect daemon terminating on signal {signum}.")
+    raise SystemExit(0)
+
+def main(default_acquisition: str = None):
+    global acquisition, saved_state
+    parser = argparse.ArgumentParser(description="Kleag's Multi-effect daemon")
+    parser.add_argument("--acquisition", choices=sorted(BACKENDS), default=default_acquisition or config.acquisition,
+                        help="how encoders are read (default: [acquisition] backend)")
+    parser.add_argument("--realtime", action="store_true",
+                        help="run the first encoder acquisition worker with SCHED_FIFO, locked memory and scheduled GC")
+    parser.add_argument("--rt-priority", type=int, default=RT_PRIORITY, help="SCHED_FIFO priority of the acquisition thread")
+    parser.add_argument("--rt-cpu", type=int, default=None, help="core to pin the acquisition thread to")
+    parser.add_argument("--debug", action="store_true", help="debug logging")
+    args = parser.parse_args()
+    if args.debug:
+        logging.getLogger().setLevel(logging.DEBUG)
+    realtime = RealtimeMode(args.rt_priority, args.rt_cpu) if args.realtime else None
+    acquisition = BACKENDS[args.acquisition](config, MCP_MAP, realtime, config.acquisition_workers)
+    logger.info(f"Encoder acquisition: {acquisition.name}, {acquisition.pool_size} worker(s)")
+
+    saved_state = load_state(config.state_path)
+
+    # Guitarix ports are linked as soon as they appear, whatever the state of the init stages
+    supervisor.add("links", link_manager.run, critical=False, stall_timeout=None, recover=False).start()
+
+    init = StagedInit()
+    init.add("midi", init_midi)
+    init.add("uinput", init_uinput)
+    init.add("i2c", init_i2c)
+    init.add("controls", init_controls, after=("midi", "i2c"))
+    init.add("analog", init_analog_controls, after=("controls", "uinput"))
+    init.run()
+    if saved_state is not None:
+        restore_state(saved_state)
+
+    # Blocking waits, without heartbeat: only their death is detected
+    supervisor.add("midi_in", midi_in.dispatch_thread, stall_timeout=None)
+    supervisor.add("persister", persister.persist_thread, critical=False, stall_timeout=None)
+    supervisor.add("state", control_state.owner_thread)
+    supervisor.add("mapping", mapping_thread)
+    if not acquisition.reads_buttons:
+        supervisor.add("buttons", buttons_thread)
+    supervisor.add("joystick", joystick.poll_joystick)
+    supervisor.add("keypad", keypad.keypad_thread)
+    supervisor.add("pedal", pedal.poll)
+    for name, target in acquisition.workers():
+        supervisor.add(name, target)
+    supervisor.add("leds", compositor.frame_thread, critical=False)
+    supervisor.add("main", main_thread_loop)
+    supervisor.add("config_watch", config_watch_thread, critical=False)
+    supervisor.start()
+    signal.signal(signal.SIGUSR1, lambda signum, frame: i2c.toggle())
+    signal.signal(signal.SIGHUP, lambda signum, frame: task_queue.put(("reload", ())))
+    signal.signal(signal.SIGTERM, terminate)  # systemctl stop / restart: leave through the save below
+    if config.metrics.get("enabled"):
+        metrics_server = MetricsServer(render_metrics, config.metrics.get("address", "127.0.0.1"),
+                                       config.metrics.get("port", 9108), config.metrics.get("unix_socket"))
+        threading.Thread(target=metrics_server.serve_thread, daemon=True).start()
+
+    logger.info(f"Kleag's Multi-effect daemon running, {time.monotonic() - STARTED:.2f} s after start.")
+    sd_notify(f"READY=1\nSTATUS=Inputs live {time.monotonic() - STARTED:.2f} s after start")
     try:
         pause()
     except KeyboardInterrupt:
         logger.info("Kleag's Multi-effect daemon terminating through keyboard interrupt.")
+    finally:
+        persister.save()  # The changes since the last periodic save, for the next warm start
+
+
+if __name__ == "__main__":
+    main()
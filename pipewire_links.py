@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+import logging
+import subprocess
+import threading
+import time
+
+from typing import List, Tuple
+
+from supervisor import heartbeat
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+
+PW_LINK = 'pw-link'
+BACKOFF_MIN = 0.5    # Seconds before the first retry of a failed link
+BACKOFF_MAX = 30.0   # Retry delay ceiling
+POLL_INTERVAL = 5.0  # Full check even when the monitor reports nothing
+SETTLE_DELAY = 0.05  # Graph changes come in bursts: wait before checking
+
+
+class LinkState:
+    """ State and metrics of one configured output -> input link """
+    def __init__(self, output: str, input: str):
+        self.output = output
+        self.input = input
+        self.linked = False
+        self.link_count = 0       # Times the link was (re)established
+        self.disconnects = 0
+        self.failures = 0         # Failed pw-link calls
+        self.waiting_since = time.monotonic()
+        self.time_to_link = None  # Seconds from start or disconnect to the last link
+        self.backoff = BACKOFF_MIN
+        self.next_attempt = 0.0
+
+    def stats(self):
+        return {
+            "linked": self.linked,
+            "link_count": self.link_count,
+            "disconnects": self.disconnects,
+            "failures": self.failures,
+            "time_to_link": self.time_to_link,
+        }
+
+
+def parse_links(text: str):
+    """Parses `pw-link -l` output into a set of (output, input) pairs."""
+    links = set()
+    port = None
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        if not line[0].isspace():
+            port = line.strip()
+            continue
+        entry = line.strip()
+        if entry.startswith("|->") and port is not None:
+            links.add((port, entry[3:].strip()))
+        elif entry.startswith("|<-") and port is not None:
+            links.add((entry[3:].strip(), port))
+    return links
+
+
+class PipeWireLinkManager:
+    """ Keeps the configured PipeWire MIDI links up.
+
+    A `pw-link -m` monitor process reports graph changes. Each change (or
+    POLL_INTERVAL without any) triggers a check: present ports that should
+    be linked and are not get linked. Failed attempts are retried with an
+    exponential backoff. pw_link can point to a fake script for tests.
+    """
+    def __init__(self, links: List[Tuple[str, str]], pw_link: str = PW_LINK, poll_interval: float = POLL_INTERVAL):
+        self.links = [LinkState(output, input) for output, input in links]
+        self.pw_link = pw_link
+        self.poll_interval = poll_interval
+        self.changed = threading.Event()
+        self.checks = 0
+        self.monitor_restarts = 0
+        self._running = False
+        self._monitor = None
+
+    def _run(self, *args) -> subprocess.CompletedProcess:
+        return subprocess.run([self.pw_link, *args], capture_output=True, text=True, timeout=5)
+
+    def _list(self, *args) -> str:
+        result = self._run(*args)
+        if result.returncode != 0:
+            raise OSError(f"{self.pw_link} {' '.join(args)} failed: {result.stderr.strip()}")
+        return result.stdout
+
+    def check(self):
+        """Compares the graph with the configured links and links what can be linked."""
+        self.checks += 1
+        try:
+            ports = {line.strip() for line in (self._list("-o") + self._list("-i")).splitlines()}
+            existing = parse_links(self._list("-l"))
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"PipeWire graph unavailable: {e}")
+            return
+        now = time.monotonic()
+        for link in self.links:
+            if (link.output, link.input) in existing:
+                if not link.linked:
+                    self._linked(link, now)
+                continue
+            if link.linked:
+                link.linked = False
+                link.disconnects += 1
+                link.waiting_since = now
+                link.backoff = BACKOFF_MIN
+                link.next_attempt = 0.0
+                logger.warning(f"PipeWire link lost: {link.output} -> {link.input}")
+            if link.output not in ports or link.input not in ports or now < link.next_attempt:
+                continue
+            try:
+                result = self._run(link.output, link.input)
+                error = result.stderr.strip() if result.returncode != 0 else None
+            except (OSError, subprocess.SubprocessError) as e:  # E.g. pw-link hung: TimeoutExpired
+                error = str(e)
+            if error is None:
+                self._linked(link, now)
+            else:
+                link.failures += 1
+                link.next_attempt = now + link.backoff
+                link.backoff = min(link.backoff * 2, BACKOFF_MAX)
+                logger.warning(f"pw-link {link.output} -> {link.input} failed: {error}")
+
+    def _linked(self, link: LinkState, now: float):
+        link.linked = True
+        link.link_count += 1
+        link.backoff = BACKOFF_MIN
+        link.time_to_link = now - link.waiting_since
+        logger.info(f"PipeWire link up after {link.time_to_link:.2f} s: {link.output} -> {link.input}")
+
+    def next_timeout(self) -> float:
+        """Time until the next poll or the next retry, whichever comes first."""
+        now = time.monotonic()
+        timeout = self.poll_interval
+        for link in self.links:
+            if not link.linked and link.next_attempt > now:
+                timeout = min(timeout, link.next_attempt - now)
+        return timeout
+
+    def monitor_thread(self):
+        """Runs `pw-link -m` and signals every line it prints. Restarted with backoff."""
+        backoff = BACKOFF_MIN
+        while self._running:
+            started = time.monotonic()
+            try:
+                with subprocess.Popen([self.pw_link, "-m", "-o", "-i", "-l"], stdout=subprocess.PIPE,
+                                      stderr=subprocess.DEVNULL, text=True) as monitor:
+                    for _line in monitor.stdout:
+                        self.changed.set()
+                        if not self._running:
+                            monitor.terminate()
+                            return
+            except OSError as e:
+                logger.warning(f"Cannot start {self.pw_link} monitor: {e}")
+            self.monitor_restarts += 1
+            self.changed.set()  # PipeWire may have restarted
+            backoff = BACKOFF_MIN if time.monotonic() - started > BACKOFF_MAX else min(backoff * 2, BACKOFF_MAX)
+            time.sleep(backoff)
+
+    def run(self):
+        """Checks the links until stop(). Can be run again after an exception: the monitor is kept."""
+        self._running = True
+        if self._monitor is None or not self._monitor.is_alive():
+            self._monitor = threading.Thread(target=self.monitor_thread, daemon=True)
+            self._monitor.start()
+        while self._running:
+            heartbeat()
+            self.check()
+            if self.changed.wait(self.next_timeout()):
+                time.sleep(SETTLE_DELAY)
+                self.changed.clear()
+
+    def stop(self):
+        self._running = False
+        self.changed.set()
+
+    def stats(self):
+        return {f"{link.output} -> {link.input}": link.stats() for link in self.links}
+
+
+# === Main ===
+if __name__ == "__main__":
+    import argparse
+
+    from board_config import load_board_config
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Keep the configured PipeWire MIDI links up")
+    parser.add_argument("--pw-link", default=PW_LINK, help="pw-link executable (or a fake one for tests)")
+    args = parser.parse_args()
+
+    manager = PipeWireLinkManager(load_board_config().pipewire_links, args.pw_link)
+    try:
+        manager.run()
+    except KeyboardInterrupt:
+        logger.info(f"Link stats: {manager.stats()}")
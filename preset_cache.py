@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+import logging
+import threading
+
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+
+BANK_SELECT_MSB = 0
+BANK_SELECT_LSB = 32
+
+
+class ControlSnapshot:
+    """ State of the pedalboard controls for one preset """
+    __slots__ = ("effect_states", "encoder_values", "pedal_position")
+
+    def __init__(self, n_switches: int):
+        self.effect_states = [False] * n_switches
+        self.encoder_values = {}  # cc -> value
+        self.pedal_position = None  # Pedal position 0..127, whatever CCs its targets send
+
+    def __repr__(self):
+        return f"ControlSnapshot({self.effect_states}, {self.encoder_values}, {self.pedal_position})"
+
+
+class PresetCache:
+    """ Remembers the control state of each (bank, program) seen on the MIDI link.
+
+    Every MIDI message going out to or coming back from Guitarix is passed to
+    observe(). Bank select and program change messages move the current key,
+    control changes update the snapshot of the current preset. When a preset
+    is selected again, its snapshot can be restored without waiting for
+    Guitarix to echo the values. The expression pedal reports its position
+    with observe_pedal(): its CC values depend on the targets' tapers.
+    """
+    def __init__(self, switch_cc: int, n_switches: int, encoder_ccs: List[int]):
+        self.switch_cc = switch_cc
+        self.n_switches = n_switches
+        self.encoder_ccs = set(encoder_ccs)
+        self.bank_msb = 0
+        self.bank_lsb = 0
+        self.program = 0
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    @property
+    def key(self):
+        return ((self.bank_msb << 7) | self.bank_lsb, self.program)
+
+    def _current(self) -> ControlSnapshot:
+        snapshot = self._snapshots.get(self.key)
+        if snapshot is None:
+            snapshot = self._snapshots[self.key] = ControlSnapshot(self.n_switches)
+        return snapshot
+
+    def observe(self, msg):
+        """Updates the cache from an outgoing or incoming mido message."""
+        if msg.type == 'program_change':
+            self.observe_program(msg.program)
+        elif msg.type == 'control_change':
+            self.observe_cc(msg.control, msg.value)
+
+    def observe_program(self, program: int):
+        with self._lock:
+            self.program = program
+
+    def observe_cc(self, cc: int, value: int):
+        with self._lock:
+            if cc == BANK_SELECT_MSB:
+                self.bank_msb = value
+            elif cc == BANK_SELECT_LSB:
+                self.bank_lsb = value
+            elif self.switch_cc <= cc < self.switch_cc + self.n_switches:
+                self._current().effect_states[cc - self.switch_cc] = value > 0
+            elif cc in self.encoder_ccs:
+                self._current().encoder_values[cc] = value
+
+    def observe_pedal(self, position: int):
+        with self._lock:
+            self._current().pedal_position = position
+
+    def restore(self, bank_msb: int, bank_lsb: int, program: int, snapshot: ControlSnapshot = None):
+        """Sets the current preset, and its snapshot if given, without any MIDI message."""
+        with self._lock:
+            self.bank_msb = bank_msb
+            self.bank_lsb = bank_lsb
+            self.program = program
+            if snapshot is not None:
+                self._snapshots[self.key] = snapshot
+
+    def lookup(self) -> ControlSnapshot:
+        """Returns the snapshot of the current preset, or None if it was never seen."""
+        with self._lock:
+            return self._snapshots.get(self.key)
+
+
+class ObservedMidiOut:
+    """ FastMidiOut wrapper reporting every sent message to a PresetCache """
+    def __init__(self, port, cache: PresetCache):
+        self.port = port
+        self.cache = cache
+
+    def send_cc(self, cc: int, value: int, channel: int = 0):
+        self.port.send_cc(cc, value, channel)
+        self.cache.observe_cc(cc, value)
+
+    def send_ccs(self, group, channel: int = 0):
+        self.port.send_ccs(group, channel)
+        for cc, value in group:
+            self.cache.observe_cc(cc, value)
+
+    def send_program_change(self, program: int, channel: int = 0):
+        self.port.send_program_change(program, channel)
+        self.cache.observe_program(program)
+
+    def send(self, msg):
+        self.port.send(msg)
+        self.cache.observe(msg)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+import ctypes
+import ctypes.util
+import gc
+import logging
+import math
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+
+RT_PRIORITY = 40          # SCHED_FIFO priority, below the audio threads (PipeWire's data loop runs at 88)
+CALIBRATION_LOOPS = 2000  # Loops measured before and after entering real-time mode
+GC_INTERVAL = 1.0         # Seconds between scheduled young generation collections
+GC_FULL_EVERY = 60        # Full collection every GC_FULL_EVERY scheduled collections
+
+JITTER_BUCKET_NS = 10_000  # Histogram resolution: 10 µs
+JITTER_BUCKETS = 1000      # Up to 10 ms
+
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+
+
+class LoopJitter:
+    """ Statistics on the time between two iterations of a loop """
+    def __init__(self):
+        self.histogram = [0] * JITTER_BUCKETS
+        self.reset()
+
+    def reset(self):
+        for i in range(JITTER_BUCKETS):
+            self.histogram[i] = 0
+        self.count = 0
+        self.total = 0
+        self.total_sq = 0
+        self.max = 0
+        self.last = 0
+
+    def tick(self, now: int = 0):
+        now = now or time.monotonic_ns()
+        if self.last:
+            dt = now - self.last
+            self.count += 1
+            self.total += dt
+            self.total_sq += dt * dt
+            if dt > self.max:
+                self.max = dt
+            self.histogram[min(dt // JITTER_BUCKET_NS, JITTER_BUCKETS - 1)] += 1
+        self.last = now
+
+    def percentile(self, p: float) -> int:
+        target = self.count * p
+        seen = 0
+        for i, n in enumerate(self.histogram):
+            seen += n
+            if seen >= target:
+                return (i + 1) * JITTER_BUCKET_NS
+        return self.max
+
+    def stats(self):
+        """Loop period mean, standard deviation, 99th percentile and max, in µs."""
+        if not self.count:
+            return {"mean": 0.0, "stdev": 0.0, "p99": 0.0, "max": 0.0}
+        mean = self.total / self.count
+        variance = max(0.0, self.total_sq / self.count - mean * mean)
+        return {
+            "mean": mean / 1000,
+            "stdev": math.sqrt(variance) / 1000,
+            "p99": self.percentile(0.99) / 1000,
+            "max": self.max / 1000,
+        }
+
+
+def set_fifo_priority(priority: int) -> bool:
+    """Runs the calling thread with SCHED_FIFO at the given priority."""
+    try:
+        os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+        return True
+    except (OSError, AttributeError) as e:
+        logger.warning(f"SCHED_FIFO {priority} refused (LimitRTPRIO / rtprio in limits.conf?): {e}")
+        return False
+
+
+def pin_to_cpu(cpu: int) -> bool:
+    """Restricts the calling thread to one core."""
+    try:
+        os.sched_setaffinity(0, {cpu})
+        return True
+    except (OSError, AttributeError) as e:
+        logger.warning(f"Cannot pin thread to CPU {cpu}: {e}")
+        return False
+
+
+def lock_memory() -> bool:
+    """Locks current and future pages of the process in RAM."""
+    libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+    if libc.mlockall(MCL_CURRENT | MCL_FUTURE) != 0:
+        errno = ctypes.get_errno()
+        logger.warning(f"mlockall failed (LimitMEMLOCK?): {os.strerror(errno)}")
+        return False
+    return True
+
+
+def gc_scheduler_thread(interval: float = GC_INTERVAL, full_every: int = GC_FULL_EVERY):
+    """Collects at fixed times while automatic collection is disabled."""
+    runs = 0
+    while True:
+        time.sleep(interval)
+        runs += 1
+        if runs % full_every == 0:
+            gc.collect()
+        else:
+            gc.collect(1)
+
+
+class RealtimeMode:
+    """ Opt-in real-time settings for an acquisition loop.
+
+    The loop calls tick() once per iteration. The first CALIBRATION_LOOPS
+    iterations measure the loop jitter as is. Then the calling thread is
+    switched to SCHED_FIFO, optionally pinned to a core, memory is locked,
+    existing objects are frozen out of the GC and automatic collection is
+    replaced by scheduled collections. After as many iterations again,
+    the jitter before and after is logged.
+    """
+    def __init__(self, priority: int = RT_PRIORITY, cpu: int = None, lock: bool = True,
+                 gc_interval: float = GC_INTERVAL, calibration_loops: int = CALIBRATION_LOOPS):
+        self.priority = priority
+        self.cpu = cpu
+        self.lock = lock
+        self.gc_interval = gc_interval
+        self.calibration_loops = calibration_loops
+        self.jitter = LoopJitter()
+        self.baseline = None
+        self.realtime = None
+        self.active = False
+
+    def tick(self):
+        self.jitter.tick()
+        if self.jitter.count < self.calibration_loops:
+            return
+        if not self.active:
+            self.baseline = self.jitter.stats()
+            self.enter()
+            self.jitter.reset()
+        elif self.realtime is None:
+            self.realtime = self.jitter.stats()
+            self.log_report()
+
+    def enter(self):
+        """Applies the real-time settings to the calling thread and the process."""
+        self.active = True
+        applied = []
+        if self.lock and lock_memory():
+            applied.append("mlockall")
+        if self.gc_interval:
+            gc.collect()
+            gc.freeze()
+            gc.disable()
+            threading.Thread(target=gc_scheduler_thread, args=(self.gc_interval,), daemon=True).start()
+            applied.append(f"gc every {self.gc_interval}s")
+        if self.cpu is not None and pin_to_cpu(self.cpu):
+            applied.append(f"cpu {self.cpu}")
+        if set_fifo_priority(self.priority):
+            applied.append(f"SCHED_FIFO {self.priority}")
+        logger.info(f"Real-time mode: {', '.join(applied) or 'nothing applied'}")
+
+    def report(self):
+        if self.baseline is None or self.realtime is None:
+            return None
+        return {key: (self.baseline[key], self.realtime[key], self.baseline[key] - self.realtime[key])
+                for key in self.baseline}
+
+    def log_report(self):
+        for key, (before, after, removed) in self.report().items():
+            logger.info(f"Loop {key}: {before:.1f} µs -> {after:.1f} µs ({removed:+.1f} µs removed)")
+
+
+# === Main ===
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Measure loop jitter before and after real-time mode")
+    parser.add_argument("--priority", type=int, default=RT_PRIORITY)
+    parser.add_argument("--cpu", type=int, default=None)
+    parser.add_argument("--loops", type=int, default=CALIBRATION_LOOPS)
+    args = parser.parse_args()
+
+    rt = RealtimeMode(args.priority, args.cpu, calibration_loops=args.loops)
+    while rt.realtime is None:
+        rt.tick()
+        time.sleep(0.001)
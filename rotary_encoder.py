@@ -1,13 +1,16 @@
 #!/usr/bin/env python3
 import time
-import mido
 import logging
 
 from adafruit_mcp230xx.mcp23017 import MCP23017
 from digitalio import Direction, Pull
 from signal import pause
 
+from fast_midi import FastMidiOut
+from input_events import InputEventRing, STEP
 from mcp_button import MCPButton
+from metrics import inc
+from supervisor import heartbeat
 
 logger = logging.getLogger(__name__)
 
@@ -34,27 +37,36 @@ class RotaryEncoder:
     # 11 -> 10 (0xE)
     # 10 -> 00 (0x8)
     CCW_transitions = {0b0001, 0b0111, 0b1110, 0b1000}
+    # Detent rest position (clk, dt) = (1, 1): one step per full cycle back to it,
+    # as in rotary_encoder_int.RotaryEncoder
+    REST_STATE = 0b11
 
-    def __init__(self, midi_out, mcp: MCP23017, name: str, clk_pin: int, dt_pin: int, sw_pin: int, cc: int):
+    def __init__(self, midi_out, mcp: MCP23017, name: str, clk_pin: int, dt_pin: int, sw_pin: int, cc: int,
+                 events: InputEventRing = None, configure: bool = True, initial_value: int = None):
         logger.info(f"RotaryEncoder {name}, clk: {clk_pin}, dt: {dt_pin}, sw: {sw_pin}, cc: {cc}")
         self.midi_out = midi_out
         self.clk = mcp.get_pin(clk_pin)
         self.dt = mcp.get_pin(dt_pin)
         initial_clk = self.clk.value
         initial_dt = self.dt.value
-        for pin in (self.clk, self.dt):
-            pin.direction = Direction.INPUT
-            pin.pull = Pull.UP
+        if configure:  # Otherwise already done by ChipConfig.write_registers
+            for pin in (self.clk, self.dt):
+                pin.direction = Direction.INPUT
+                pin.pull = Pull.UP
         self.name = name,
         self.cc = cc
         # self.sw = sw
         # self.last_clk = self.clk.value
         self.last_state = (initial_clk << 1) | initial_dt
+        self.quarters = 0  # Valid transitions since the last detent, + CW, - CCW
         # self.last_sw = sw.value
-        self.midi_value = SWITCH_CC
-        self.button = MCPButton(mcp, sw_pin)
+        self.midi_value = SWITCH_CC if initial_value is None else initial_value
+        # When set, steps are queued for the mapping stage instead of sending MIDI here
+        self.events = events
+        self.button = MCPButton(mcp, sw_pin, events, configure)
         self.button.when_pressed = self.button_pressed
-        self.send_cc(self.midi_value)
+        if initial_value is None:  # Otherwise restored: Guitarix already has it
+            self.send_cc(self.midi_value)
 
 
     def button_pressed(self):
@@ -86,16 +98,12 @@ class RotaryEncoder:
             if transition in RotaryEncoder.CW_transitions:
                 # logger.debug(f"Encoder {self.name} Rotated → (clockwise)")
                 self.last_state = current_state # Update state after a valid step
-                direction = 1
-                # logger.info(f"{encoder['name']} turned {direction}, send to {encoder['cc']}")
-                self.increment_cc_value(direction)
+                self.quarters += 1
 
             elif transition in RotaryEncoder.CCW_transitions:
                 # logger.debug(f"Encoder {self.name} Rotated → (counterclockwise)")
                 self.last_state = current_state # Update state after a valid step
-                direction = -1
-                # logger.debug(f"{encoder['name']} turned {direction}, send to {encoder['cc']}")
-                self.increment_cc_value(direction)
+                self.quarters -= 1
 
             # 6. Optional: If the transition is invalid (i.e., due to bounce/noise),
             #    we generally ignore it and wait for a valid state.
@@ -109,12 +117,26 @@ class RotaryEncoder:
                 #    to detect the next valid step from the new physical position.
                 # logger.debug(f"Encoder {encoder['name']} state corrected (Invalid transition: {bin(transition)})")
                 self.last_state = current_state
+                inc("encoder_invalid_transitions_total", (("cc", self.cc),))
             # The key is to only update last_state *after* a valid transition has completed.
 
+            # 7. Back at rest: one step in the net direction of the cycle. Bounces cancel out, missed transitions do not matter
+            if current_state == RotaryEncoder.REST_STATE:
+                if self.quarters:
+                    self.step(1 if self.quarters > 0 else -1)
+                self.quarters = 0
+
     def send_cc(self, value):
         # logger.info(f"RotaryEncoder.send_cc {self.name}: {self.cc}, {value}")
-        msg = mido.Message('control_change', control=self.cc, value=value)
-        self.midi_out.send(msg)
+        self.midi_out.send_cc(self.cc, value)
+
+    def step(self, direction):
+        """Handles one detent: queued if an event ring is set, applied inline otherwise."""
+        inc("encoder_steps_total", (("cc", self.cc), ("direction", "cw" if direction > 0 else "ccw")))
+        if self.events is not None:
+            self.events.push(self, STEP, direction)
+        else:
+            self.increment_cc_value(direction)
 
     def increment_cc_value(self, direction):
         """Adjusts the MIDI CC value for an encoder incrementally."""
@@ -128,6 +150,7 @@ class RotaryEncoder:
 
     def poll_thread(self):
         while True:
+            heartbeat()
             self.read_encoder_state_machine()
             time.sleep(0.001)
 
@@ -141,7 +164,7 @@ if __name__ == "__main__":
     i2c = busio.I2C(board.SCL, board.SDA)
     mcp = MCP23017(i2c, address=0x20)
     # --- MIDI SETUP ---
-    midi_out = mido.open_output('KleagMFX', virtual=True)
+    midi_out = FastMidiOut('KleagMFX')
     encoder = RotaryEncoder(midi_out, mcp, "Encoder 0", 9, 8, 0, 20)
     threading.Thread(target=encoder.poll_thread, daemon=True).start()
 
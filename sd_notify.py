@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+import logging
+import os
+import socket
+
+logger = logging.getLogger(__name__)
+
+
+def sd_notify(state: str) -> bool:
+    """Sends a state ("READY=1", "WATCHDOG=1", "STATUS=...") to systemd.
+
+    Implements the sd_notify(3) datagram protocol, so python-systemd is not
+    needed. Does nothing and returns False when not started by a
+    Type=notify unit (NOTIFY_SOCKET unset).
+    """
+    address = os.environ.get("NOTIFY_SOCKET")
+    if not address:
+        return False
+    if address[0] == "@":  # Abstract namespace socket
+        address = "\0" + address[1:]
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM | socket.SOCK_CLOEXEC) as sock:
+            sock.connect(address)
+            sock.sendall(state.encode())
+    except OSError as e:
+        logger.warning(f"sd_notify({state!r}) failed: {e}")
+        return False
+    return True
+
+
+# === Main ===
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.DEBUG)
+    for state in sys.argv[1:] or ["STATUS=sd_notify test"]:
+        logger.info(f"{state}: {'sent' if sd_notify(state) else 'not sent'}")
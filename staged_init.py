@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """ One initialisation step and the names of the stages it needs """
+    def __init__(self, name: str, func, after=()):
+        self.name = name
+        self.func = func
+        self.after = tuple(after)
+        self.done = threading.Event()
+        self.start = None     # Seconds from StagedInit.run() start
+        self.duration = None
+        self.error = None
+
+
+class StagedInit:
+    """ Runs initialisation stages concurrently, each as soon as its dependencies are done.
+
+    Stages mostly wait on I2C, ioctl and subprocesses, so threads are enough.
+    A failing stage makes run() raise once every stage has finished or been
+    skipped; stages depending on it are skipped.
+    """
+    def __init__(self):
+        self.stages = {}
+        self.elapsed = None
+
+    def add(self, name: str, func, after=()):
+        for dep in after:
+            if dep not in self.stages:
+                raise ValueError(f"Stage {name!r} depends on unknown stage {dep!r}")
+        self.stages[name] = Stage(name, func, after)
+
+    def _run_stage(self, stage: Stage, t0: float):
+        try:
+            for dep in stage.after:
+                self.stages[dep].done.wait()
+                if self.stages[dep].error is not None:
+                    stage.error = RuntimeError(f"skipped, {dep} failed")
+                    return
+            stage.start = time.monotonic() - t0
+            stage.func()
+            stage.duration = time.monotonic() - t0 - stage.start
+        except BaseException as e:  # SystemExit too: in a stage thread it would only end that thread
+            logger.exception(f"Init stage {stage.name} failed")
+            stage.error = e
+        finally:
+            stage.done.set()
+
+    def run(self):
+        t0 = time.monotonic()
+        threads = [threading.Thread(target=self._run_stage, args=(stage, t0), name=f"init-{stage.name}", daemon=True)
+                   for stage in self.stages.values()]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.elapsed = time.monotonic() - t0
+        self.log_report()
+        failed = [stage for stage in self.stages.values() if stage.error is not None]
+        if failed:
+            raise RuntimeError(f"Initialisation failed: {', '.join(f'{s.name} ({s.error})' for s in failed)}")
+
+    def durations(self):
+        return {name: stage.duration for name, stage in self.stages.items()}
+
+    def log_report(self):
+        for stage in sorted(self.stages.values(), key=lambda s: (s.start is None, s.start)):
+            if stage.duration is None:
+                logger.info(f"  {stage.name:<10} {'failed' if stage.error else 'not run'}")
+            else:
+                logger.info(f"  {stage.name:<10} {stage.start * 1000:7.1f} ms +{stage.duration * 1000:7.1f} ms")
+        logger.info(f"Initialisation done in {self.elapsed * 1000:.1f} ms")
+
+
+# === Main ===
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    init = StagedInit()
+    init.add("a", lambda: time.sleep(0.2))
+    init.add("b", lambda: time.sleep(0.1))
+    init.add("c", lambda: time.sleep(0.1), after=("a", "b"))
+    init.run()  # About 0.3 s instead of 0.4 s in sequence
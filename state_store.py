@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+import logging
+import queue
+
+from supervisor import heartbeat
+
+logger = logging.getLogger(__name__)
+
+
+class StateSnapshot:
+    """ Immutable control state, replaced as a whole on each commit """
+    __slots__ = ("version", "effect_states")
+
+    def __init__(self, version: int, effect_states: tuple):
+        self.version = version              # Mutations applied since startup
+        self.effect_states = effect_states  # One bool per switch
+
+    def __repr__(self):
+        return f"StateSnapshot(v{self.version}, {self.effect_states})"
+
+
+class StateStore:
+    """ Control state with a single writer.
+
+    Any thread submits mutations; owner_thread is the only one applying
+    them. It drains the queue, applies the whole batch to a working copy,
+    publishes a new StateSnapshot (one reference assignment, so readers
+    just read store.snapshot, without locks, and always see a consistent
+    state) and calls on_commit(snapshot, changed, sends) once per batch:
+    changed is the set of switch indices whose state changed, sends the
+    (switch, state) pairs to send out in order. Each mutation increments
+    the version.
+    """
+    def __init__(self, n_switches: int, on_commit=None):
+        self.snapshot = StateSnapshot(0, (False,) * n_switches)
+        self.on_commit = on_commit
+        self._queue = queue.SimpleQueue()
+        self.commits = 0
+
+    # --- Mutations, from any thread ---
+    def toggle(self, idx: int):
+        """Local toggle (foot switch, gesture): the new state is sent out."""
+        self._queue.put((self._toggle, (idx,)))
+
+    def set_effects(self, changes: dict):
+        """States reported from outside (MIDI input), {switch: state}: nothing is sent back."""
+        self._queue.put((self._set_effects, (dict(changes),)))
+
+    def set_all(self, states):
+        """New preset or restored state: nothing is sent."""
+        self._queue.put((self._set_all, (tuple(states),)))
+
+    # --- Owner side ---
+    @staticmethod
+    def _toggle(states, sends, idx):
+        states[idx] = not states[idx]
+        sends.append((idx, states[idx]))
+
+    @staticmethod
+    def _set_effects(states, sends, changes):
+        for idx, on in changes.items():
+            states[idx] = on
+
+    @staticmethod
+    def _set_all(states, sends, new_states):
+        for i in range(len(states)):
+            states[i] = new_states[i] if i < len(new_states) else False
+
+    def process(self, block: bool = False, timeout: float = None) -> bool:
+        """Applies the pending mutations as one batch. Only from the owner thread (or before it starts)."""
+        try:
+            mutation, args = self._queue.get(block, timeout)
+        except queue.Empty:
+            return False
+        old = self.snapshot
+        states = list(old.effect_states)
+        sends = []
+        version = old.version
+        while True:
+            mutation(states, sends, *args)
+            version += 1
+            try:
+                mutation, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+        self.snapshot = snapshot = StateSnapshot(version, tuple(states))
+        self.commits += 1
+        changed = {i for i, (a, b) in enumerate(zip(old.effect_states, snapshot.effect_states)) if a != b}
+        if self.on_commit is not None and (changed or sends):
+            self.on_commit(snapshot, changed, sends)
+        return True
+
+    def owner_thread(self):
+        while True:
+            heartbeat()
+            self.process(block=True, timeout=0.1)
+
+
+# === Main ===
+if __name__ == "__main__":
+    import threading
+    import time
+
+    logging.basicConfig(level=logging.INFO)
+    store = StateStore(4, lambda snapshot, changed, sends: logger.info(f"{snapshot} changed {changed}, {len(sends)} sends"))
+    threading.Thread(target=store.owner_thread, daemon=True).start()
+    writers = [threading.Thread(target=lambda i=i: [store.toggle(i % 4) for _ in range(1001)]) for i in range(8)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+    time.sleep(0.2)
+    logger.info(f"{store.snapshot} after {store.commits} commits")
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+import logging
+import threading
+import time
+
+from sd_notify import sd_notify
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+
+CHECK_INTERVAL = 0.25   # Seconds between health checks (and WATCHDOG=1 notifications)
+STALL_TIMEOUT = 1.0     # A loop without heartbeat for this long is stalled
+RESTART_BACKOFF_MIN = 0.1
+RESTART_BACKOFF_MAX = 2.0  # Bound on the delay before a failed worker runs again
+# Upper bounds (µs) of the iteration time histogram buckets, the last one is open
+HISTOGRAM_BUCKETS = (250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000)
+
+_local = threading.local()
+
+
+class WorkerRetired(Exception):
+    """ Raised in a stalled loop that came back after its replacement was started """
+
+
+class LoopStats:
+    """ Iteration timing of one worker loop, updated only by the loop's own thread """
+    def __init__(self):
+        self.iterations = 0
+        self.heartbeat = time.monotonic()
+        self.max_us = 0
+        self.total_us = 0
+        self.histogram = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+
+    def tick(self):
+        now = time.monotonic()
+        elapsed_us = int((now - self.heartbeat) * 1e6)
+        self.heartbeat = now
+        self.iterations += 1
+        self.total_us += elapsed_us
+        if elapsed_us > self.max_us:
+            self.max_us = elapsed_us
+        for i, bound in enumerate(HISTOGRAM_BUCKETS):
+            if elapsed_us <= bound:
+                self.histogram[i] += 1
+                return
+        self.histogram[-1] += 1
+
+    def percentile_us(self, fraction: float):
+        """Upper bound of the bucket holding the given fraction of iterations."""
+        target = fraction * sum(self.histogram)
+        count = 0
+        for i, n in enumerate(self.histogram):
+            count += n
+            if count >= target and n:
+                return min(HISTOGRAM_BUCKETS[i], self.max_us) if i < len(HISTOGRAM_BUCKETS) else self.max_us
+        return 0
+
+
+def heartbeat():
+    """Called once per iteration by supervised loops. Does nothing in other threads."""
+    worker = getattr(_local, "worker", None)
+    if worker is not None:
+        if worker.generation != _local.generation:
+            raise WorkerRetired(worker.name)
+        worker.stats.tick()
+
+
+class Worker:
+    """ One supervised thread running target() forever """
+    def __init__(self, name: str, target, critical: bool = True, stall_timeout: float = STALL_TIMEOUT,
+                 recover: bool = True):
+        self.name = name
+        self.target = target
+        self.critical = critical
+        self.recover = recover  # Run the supervisor's recover() before restarting it (bus workers)
+        self.stall_timeout = stall_timeout  # None: the loop has no heartbeat (blocking waits)
+        self.stats = LoopStats()
+        self.thread = None
+        self.generation = 0
+        self.restarts = 0
+        self.failures = 0
+        self.last_error = None
+        self.backoff = RESTART_BACKOFF_MIN
+        self.restart_at = None  # Set when the worker must be started again
+        self.started_at = None
+
+    def _run(self, generation: int):
+        _local.worker = self
+        _local.generation = generation
+        try:
+            self.target()
+            logger.warning(f"Worker {self.name} returned")
+        except WorkerRetired:
+            logger.info(f"Stalled worker {self.name} came back and exited")
+            return
+        except Exception as e:
+            self.last_error = e
+            logger.exception(f"Worker {self.name} died")
+        if self.generation == generation:
+            self.failures += 1
+
+    def start(self):
+        self.generation += 1
+        self.started_at = self.stats.heartbeat = time.monotonic()
+        self.thread = threading.Thread(target=self._run, args=(self.generation,), name=self.name, daemon=True)
+        self.thread.start()
+
+    def healthy(self, now: float) -> bool:
+        if self.thread is None or not self.thread.is_alive():
+            return False
+        return self.stall_timeout is None or now - self.stats.heartbeat <= self.stall_timeout
+
+    def stats_dict(self):
+        return {
+            "iterations": self.stats.iterations,
+            "p50_us": self.stats.percentile_us(0.5),
+            "p99_us": self.stats.percentile_us(0.99),
+            "max_us": self.stats.max_us,
+            "restarts": self.restarts,
+            "failures": self.failures,
+        }
+
+
+class Supervisor:
+    """ Starts the worker loops, restarts the ones that die or stall, feeds the systemd watchdog.
+
+    Supervised loops call heartbeat() once per iteration. A loop that dies
+    (uncaught exception, e.g. OSError on an I2C glitch) or stops beating is
+    replaced by a new thread after recover() ran, with a backoff bounded by
+    RESTART_BACKOFF_MAX. A stalled thread cannot be killed: when it comes
+    back, its next heartbeat() raises WorkerRetired so it exits. WATCHDOG=1
+    is only sent while every critical loop is healthy, so systemd restarts
+    the daemon if recovery does not work (WatchdogSec in the unit).
+    """
+    def __init__(self, recover=None, check_interval: float = CHECK_INTERVAL):
+        self.recover = recover
+        self.check_interval = check_interval
+        self.workers = []
+        self.recoveries = 0
+        self.healthy = False
+
+    def add(self, name: str, target, critical: bool = True, stall_timeout: float = STALL_TIMEOUT,
+            recover: bool = True) -> Worker:
+        worker = Worker(name, target, critical, stall_timeout, recover)
+        self.workers.append(worker)
+        return worker
+
+    def start(self):
+        for worker in self.workers:
+            if worker.thread is None:  # Not started early
+                worker.start()
+        threading.Thread(target=self.supervise_thread, name="supervisor", daemon=True).start()
+
+    def _recover(self, worker: Worker):
+        if self.recover is None or not worker.recover:
+            return
+        try:
+            self.recover()
+            self.recoveries += 1
+        except Exception:
+            logger.exception(f"Bus recovery for {worker.name} failed")
+
+    def check(self):
+        now = time.monotonic()
+        healthy = True
+        for worker in self.workers:
+            if worker.restart_at is not None:
+                if now >= worker.restart_at:
+                    self._recover(worker)
+                    worker.restart_at = None
+                    worker.restarts += 1
+                    worker.start()
+                    logger.warning(f"Worker {worker.name} restarted ({worker.restarts} restarts)")
+                healthy = healthy and not worker.critical
+                continue
+            if worker.healthy(now):
+                if now - worker.started_at > RESTART_BACKOFF_MAX:
+                    worker.backoff = RESTART_BACKOFF_MIN  # Running fine again
+                continue
+            if worker.thread.is_alive():
+                logger.error(f"Worker {worker.name} stalled for {now - worker.stats.heartbeat:.2f} s")
+                worker.generation += 1  # The stalled thread exits when it comes back
+            else:
+                logger.error(f"Worker {worker.name} is dead: {worker.last_error!r}")
+            worker.restart_at = now + worker.backoff
+            worker.backoff = min(worker.backoff * 2, RESTART_BACKOFF_MAX)
+            healthy = healthy and not worker.critical
+        self.healthy = healthy
+        if healthy:
+            sd_notify("WATCHDOG=1")
+
+    def supervise_thread(self):
+        while True:
+            self.check()
+            time.sleep(self.check_interval)
+
+    def stats(self):
+        return {worker.name: worker.stats_dict() for worker in self.workers}
+
+
+# === Main ===
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    def flaky_loop():
+        for i in range(100):
+            heartbeat()
+            time.sleep(0.01)
+        raise OSError(121, "Remote I/O error")  # What an I2C glitch looks like
+
+    def stuck_loop():
+        heartbeat()
+        time.sleep(3)
+        heartbeat()  # Raises WorkerRetired: replaced meanwhile
+
+    supervisor = Supervisor(recover=lambda: logger.info("Recovering the bus"))
+    supervisor.add("flaky", flaky_loop)
+    supervisor.add("stuck", stuck_loop)
+    supervisor.start()
+    time.sleep(5)
+    logger.info(f"Stats: {supervisor.stats()}")
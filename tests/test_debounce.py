@@ -0,0 +1,44 @@
+from debounce import Debouncer
+
+MS = 1_000_000
+
+
+def test_first_edge_reported_at_once():
+    debouncer = Debouncer(0.03)
+    assert debouncer.sample(True, 100 * MS)
+    assert debouncer.state
+    assert debouncer.until_ns == 130 * MS
+
+
+def test_bounces_ignored_during_lockout():
+    debouncer = Debouncer(0.03)
+    assert debouncer.sample(True, 1)
+    changes = [debouncer.sample(level, t * MS) for t, level in ((1, False), (2, True), (3, False), (4, True))]
+    assert changes == [False] * 4
+    assert debouncer.state
+    assert debouncer.bounces == 4
+
+
+def test_settle_takes_level_changed_during_lockout():
+    debouncer = Debouncer(0.03)
+    debouncer.sample(True, 1)
+    debouncer.sample(False, 10 * MS)  # Released during the lockout, no read after it
+    assert not debouncer.settle(20 * MS)  # Lockout not over
+    assert debouncer.settle(31 * MS)
+    assert not debouncer.state
+    assert debouncer.until_ns == 61 * MS  # A new lockout from the settled edge
+
+
+def test_settle_without_change_does_nothing():
+    debouncer = Debouncer(0.03)
+    debouncer.sample(True, 1)
+    debouncer.sample(False, 5 * MS)
+    debouncer.sample(True, 10 * MS)  # Bounced back to the debounced level
+    assert not debouncer.settle(40 * MS)
+    assert debouncer.state
+
+
+def test_zero_lockout_follows_every_edge():
+    debouncer = Debouncer(0)
+    assert [debouncer.sample(level, t + 1) for t, level in enumerate((True, False, True))] == [True] * 3
+    assert debouncer.bounces == 0
@@ -0,0 +1,78 @@
+import importlib
+
+import pytest
+
+pytest.importorskip("digitalio")
+pytest.importorskip("adafruit_mcp230xx.mcp23017")
+
+from input_events import InputEventRing, STEP
+
+CLK, DT, SW = 0, 1, 2
+CW = ((0, 1), (0, 0), (1, 0), (1, 1))   # (clk, dt) from rest (1, 1)
+CCW = ((1, 0), (0, 0), (0, 1), (1, 1))
+
+
+class FakePin:
+    def __init__(self, mcp, pin: int):
+        self.mcp = mcp
+        self.pin = pin
+
+    @property
+    def value(self):
+        return bool((self.mcp.gpio >> self.pin) & 1)
+
+
+class FakeMCP:
+    """ Port levels set by the test, pulled up at rest """
+    def __init__(self):
+        self.gpio = 0xFFFF
+
+    def get_pin(self, pin: int):
+        return FakePin(self, pin)
+
+    def set(self, clk: int, dt: int):
+        self.gpio = (self.gpio & ~0b11) | (clk << CLK) | (dt << DT)
+
+
+@pytest.fixture(params=["rotary_encoder_int", "rotary_encoder"])
+def encoder(request):
+    module = importlib.import_module(request.param)
+    mcp = FakeMCP()
+    events = InputEventRing(64)
+    enc = module.RotaryEncoder(None, mcp, "test", CLK, DT, SW, 20, events, configure=False, initial_value=0)
+    return enc, mcp, events
+
+
+def turn(encoder, states):
+    enc, mcp, events = encoder
+    for clk, dt in states:
+        mcp.set(clk, dt)
+        enc.read_encoder_state_machine()
+    steps = []
+    events.drain(lambda event: steps.append(event.value) if event.kind == STEP else None)
+    return steps
+
+
+def test_one_step_per_detent(encoder):
+    assert turn(encoder, CW) == [1]
+    assert turn(encoder, CW * 3) == [1, 1, 1]
+    assert turn(encoder, CCW * 2) == [-1, -1]
+
+
+def test_no_step_before_rest(encoder):
+    assert turn(encoder, CW[:3]) == []
+    assert turn(encoder, CW[3:]) == [1]
+
+
+def test_bounce_cancels_out(encoder):
+    # Back and forth on the first quarter, then the full cycle
+    assert turn(encoder, ((0, 1), (1, 1), (0, 1), (0, 0), (0, 1), (0, 0), (1, 0), (1, 1))) == [1]
+
+
+def test_missed_transition_still_steps(encoder):
+    # (0, 0) is skipped, as when a sample falls between two edges: the jump is invalid and ignored
+    assert turn(encoder, ((0, 1), (1, 0), (1, 1))) == [1]
+
+
+def test_turned_back_before_rest_is_no_step(encoder):
+    assert turn(encoder, ((0, 1), (0, 0), (0, 1), (1, 1))) == []
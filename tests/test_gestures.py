@@ -0,0 +1,79 @@
+from gestures import Action, DOUBLE_TAP, GestureEngine, LONG_PRESS, TAP
+
+MS = 1_000_000
+
+
+def make_engine(undoable_tap: bool = True):
+    log = []
+    state = {"effect": False}
+
+    def toggle():
+        state["effect"] = not state["effect"]
+        log.append("toggle")
+
+    engine = GestureEngine()
+    engine.add(0, {TAP: Action("toggle", toggle, toggle if undoable_tap else None),
+                   DOUBLE_TAP: Action("bank up", lambda: log.append("bank up")),
+                   LONG_PRESS: Action("tuner", lambda: log.append("tuner"))})
+    return engine, state, log
+
+
+def play(engine, events, end_ms):
+    for t, pressed in events:
+        engine.poll(t * MS)
+        (engine.press if pressed else engine.release)(0, t * MS)
+    engine.poll(end_ms * MS)
+
+
+def test_tap_is_speculative():
+    engine, state, log = make_engine()
+    engine.press(0, 1)
+    assert state["effect"]  # Runs on the press
+    engine.release(0, 80 * MS)
+    engine.poll(1000 * MS)
+    assert state["effect"]
+    assert log == ["toggle"]
+
+
+def test_double_tap_undoes_the_tap():
+    engine, state, log = make_engine()
+    play(engine, [(1, True), (80, False), (200, True), (280, False)], 1000)
+    assert not state["effect"]
+    assert log == ["toggle", "toggle", "bank up"]
+
+
+def test_long_press_undoes_the_tap():
+    engine, state, log = make_engine()
+    play(engine, [(1, True)], 700)
+    assert not state["effect"]
+    assert log == ["toggle", "toggle", "tuner"]
+    engine.release(0, 900 * MS)
+    engine.poll(1500 * MS)
+    assert log == ["toggle", "toggle", "tuner"]  # Nothing more for the release
+
+
+def test_presses_outside_the_window_are_two_taps():
+    engine, state, log = make_engine()
+    play(engine, [(1, True), (80, False), (500, True), (580, False)], 1500)
+    assert not state["effect"]
+    assert log == ["toggle", "toggle"]
+
+
+def test_tap_without_undo_is_deferred():
+    engine, state, log = make_engine(undoable_tap=False)
+    engine.press(0, 1)
+    engine.release(0, 80 * MS)
+    assert log == []  # Could still become a double-tap
+    engine.poll(400 * MS)
+    assert log == ["toggle"]
+    engine, state, log = make_engine(undoable_tap=False)
+    play(engine, [(1, True), (80, False), (200, True), (280, False)], 1000)
+    assert log == ["bank up"]
+
+
+def test_timeout_follows_the_next_deadline():
+    engine, state, log = make_engine()
+    engine.press(0, 1000 * MS)
+    assert abs(engine.timeout(1050 * MS) - 0.1) < 1e-9  # Capped at IDLE_TIMEOUT
+    engine.release(0, 1080 * MS)
+    assert abs(engine.timeout(1250 * MS) - 0.05) < 1e-6  # End of the double-tap window
@@ -0,0 +1,53 @@
+from input_events import InputEventRing, PRESS, STEP
+
+
+def test_push_drain_in_order():
+    ring = InputEventRing(4)
+    for i in range(3):
+        assert ring.push("enc", STEP, i, 100 + i)
+    seen = []
+    assert ring.drain(lambda event: seen.append((event.source, event.kind, event.value, event.t_ns))) == 3
+    assert seen == [("enc", STEP, 0, 100), ("enc", STEP, 1, 101), ("enc", STEP, 2, 102)]
+    assert len(ring) == 0
+
+
+def test_overflow_drops_and_counts():
+    ring = InputEventRing(4)
+    for i in range(4):
+        assert ring.push(None, STEP, i, 1)
+    assert not ring.push(None, STEP, 4, 1)
+    assert not ring.push(None, STEP, 5, 1)
+    assert ring.overflows == 2
+    assert ring.high_water == 4
+    values = []
+    ring.drain(lambda event: values.append(event.value))
+    assert values == [0, 1, 2, 3]  # The newest events are the ones dropped
+
+
+def test_slots_are_recycled():
+    ring = InputEventRing(2)
+    first = []
+    for i in range(2):
+        ring.push(None, PRESS, i, 1)
+    ring.drain(first.append)
+    again = []
+    for i in range(2):
+        ring.push(None, STEP, i + 2, 2)
+    ring.drain(again.append)
+    assert [id(event) for event in again] == [id(event) for event in first]  # No new event objects
+    assert [(event.kind, event.value) for event in again] == [(STEP, 2), (STEP, 3)]
+    assert ring.pushed == ring.drained == 4
+    assert ring.overflows == 0
+
+
+def test_drain_max_events_keeps_rest_ready():
+    ring = InputEventRing(8)
+    for i in range(5):
+        ring.push(None, STEP, i, 1)
+    values = []
+    assert ring.drain(lambda event: values.append(event.value), max_events=2) == 2
+    assert values == [0, 1]
+    assert ring.wait(0)  # Still events pending
+    assert ring.drain(lambda event: values.append(event.value)) == 3
+    assert values == [0, 1, 2, 3, 4]
+    assert not ring.wait(0)
@@ -0,0 +1,66 @@
+from midi_echo import EchoLedger, LedgerMidiOut, MAX_PENDING
+
+MS = 1_000_000
+
+
+def test_echo_within_window_is_suppressed():
+    ledger = EchoLedger(0.05)
+    ledger.record(20, 64, 1000 * MS)
+    assert ledger.is_echo(20, 64, 1012 * MS)
+    assert not ledger.is_echo(20, 64, 1013 * MS)  # Consumed by the first echo
+    assert (ledger.suppressed, ledger.accepted) == (1, 1)
+
+
+def test_value_after_window_is_accepted():
+    ledger = EchoLedger(0.05)
+    ledger.record(20, 64, 1000 * MS)
+    assert not ledger.is_echo(20, 64, 1051 * MS)
+
+
+def test_other_cc_or_value_is_accepted():
+    ledger = EchoLedger(0.05)
+    ledger.record(20, 64, 1000 * MS)
+    assert not ledger.is_echo(21, 64, 1010 * MS)
+    assert not ledger.is_echo(20, 65, 1010 * MS)
+    assert ledger.is_echo(20, 64, 1010 * MS)
+
+
+def test_late_echoes_of_a_turning_encoder():
+    ledger = EchoLedger(0.05)
+    for i, value in enumerate(range(20, 25)):  # One step every 5 ms
+        ledger.record(20, value, 1000 * MS + i * 5 * MS)
+    # Echoes 12 ms later: each one is suppressed, none sets the encoder back
+    assert all(ledger.is_echo(20, value, 1012 * MS + i * 5 * MS) for i, value in enumerate(range(20, 25)))
+    # An echo drops the older values of its CC: their echoes would come before it
+    ledger.record(20, 30, 1100 * MS)
+    ledger.record(20, 31, 1105 * MS)
+    assert ledger.is_echo(20, 31, 1110 * MS)
+    assert not ledger.is_echo(20, 30, 1111 * MS)
+
+
+def test_pending_values_are_bounded():
+    ledger = EchoLedger(0.05)
+    for i in range(MAX_PENDING + 1):
+        ledger.record(20, i % 128, 1000 * MS + i)
+    assert not ledger.is_echo(20, 0, 1001 * MS)  # The oldest one was forgotten
+    assert ledger.is_echo(20, MAX_PENDING, 1001 * MS)
+
+
+def test_ledger_midi_out_records_sends():
+    class Port:
+        def __init__(self):
+            self.sent = []
+
+        def send_cc(self, cc, value, channel=0):
+            self.sent.append((cc, value))
+
+        def send_ccs(self, group, channel=0):
+            self.sent.extend(group)
+
+    ledger = EchoLedger(0.05)
+    port = Port()
+    out = LedgerMidiOut(port, ledger)
+    out.send_cc(20, 64)
+    out.send_ccs([(21, 1), (22, 2)])
+    assert port.sent == [(20, 64), (21, 1), (22, 2)]
+    assert ledger.is_echo(20, 64) and ledger.is_echo(21, 1) and ledger.is_echo(22, 2)
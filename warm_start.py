@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+import json
+import logging
+import os
+import tempfile
+import time
+
+logger = logging.getLogger(__name__)
+
+# --- CONFIGURATION ---
+
+STATE_VERSION = 1
+STATE_PATH = os.path.join(os.environ.get("XDG_STATE_HOME", os.path.expanduser("~/.local/state")),
+                          "kleagmfx", "state.json")
+SAVE_INTERVAL = 2.0  # Seconds between checks for a changed state
+
+
+def save_state(state: dict, path: str = STATE_PATH):
+    """Writes state atomically: a crash leaves either the old or the new file, never a partial one."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".state-", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump({"version": STATE_VERSION, **state}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_state(path: str = STATE_PATH):
+    """Returns the saved state, or None when there is none or it cannot be used."""
+    try:
+        with open(path) as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring saved state {path}: {e}")
+        return None
+    if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+        logger.warning(f"Ignoring saved state {path}: unknown version")
+        return None
+    return state
+
+
+class StatePersister:
+    """ Saves the control state periodically, from its own thread.
+
+    collect() returns the state as a JSON-serialisable dict. It is called
+    every interval and the file is only rewritten when the state changed, so
+    the control loops never wait on the SD card.
+    """
+    def __init__(self, collect, path: str = STATE_PATH, interval: float = SAVE_INTERVAL):
+        self.collect = collect
+        self.path = path
+        self.interval = interval
+        self.saves = 0
+        self._last = None
+
+    def save(self):
+        state = self.collect()
+        if state == self._last:
+            return False
+        try:
+            save_state(state, self.path)
+        except OSError as e:
+            logger.warning(f"Cannot save state to {self.path}: {e}")
+            return False
+        self._last = state
+        self.saves += 1
+        return True
+
+    def persist_thread(self):
+        while True:
+            time.sleep(self.interval)
+            self.save()
+
+
+# === Main ===
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    path = sys.argv[1] if len(sys.argv) > 1 else STATE_PATH
+    logger.info(f"{path}: {load_state(path)}")